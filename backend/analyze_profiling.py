@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Profiling 日誌離線分析工具
+串流讀取 profiling_logs/*.jsonl（含 .gz 壓縮檔），記憶體用量固定，不需整份載入
+
+用法：
+    python analyze_profiling.py                          # 分析 profiling_logs/ 下所有日誌
+    python analyze_profiling.py logs/*.jsonl.gz --group-by route,status --window hour
+    python analyze_profiling.py --slowest 20 --compare   # 最慢請求與逐日退步比較
+"""
+import argparse
+import glob
+import gzip
+import heapq
+import json
+import os
+import re
+import sys
+from datetime import datetime
+
+from profiling_middleware import LatencyHistogram, PERCENTILES, log_dir
+
+# 舊日誌沒有 route 欄位：把 UUID 與純數字路徑段還原為樣板
+_UUID_SEGMENT = re.compile(r"/[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}(?=/|$)")
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+WINDOW_FORMATS = {
+    "none": None,
+    "minute": "%Y-%m-%d %H:%M",
+    "hour": "%Y-%m-%d %H:00",
+    "day": "%Y-%m-%d",
+}
+
+
+def normalize_route(entry: dict) -> str:
+    route = entry.get("route")
+    if route:
+        return route
+    path = entry.get("path", "")
+    path = _UUID_SEGMENT.sub("/{id}", path)
+    return _NUMERIC_SEGMENT.sub("/{id}", path)
+
+
+def expand_paths(paths: list) -> list:
+    """展開檔案、目錄與萬用字元，依檔名排序"""
+    if not paths:
+        paths = [log_dir]
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files.extend(glob.glob(os.path.join(p, "*.jsonl")))
+            files.extend(glob.glob(os.path.join(p, "*.jsonl.gz")))
+        elif any(ch in p for ch in "*?["):
+            files.extend(glob.glob(p))
+        else:
+            files.append(p)
+    return sorted(set(files))
+
+
+def iter_entries(files: list):
+    """逐行讀取日誌，略過格式錯誤的行"""
+    for path in files:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                    entry["_ts"] = datetime.fromisoformat(entry["timestamp"])
+                    entry["_duration"] = float(entry["duration_ms"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                yield entry
+
+
+def analyze(entries, group_by: set, window: str, slowest: int):
+    """單次掃描產生分組直方圖、最慢請求與逐日路由直方圖"""
+    window_format = WINDOW_FORMATS[window]
+    groups = {}
+    daily = {}
+    slow_heap = []  # 最小堆，只保留最慢的 N 筆
+    seq = 0
+
+    for entry in entries:
+        route = f"{entry.get('method', '')} {normalize_route(entry)}"
+        duration = entry["_duration"]
+
+        key = (
+            entry["_ts"].strftime(window_format) if window_format else "",
+            route if "route" in group_by else "",
+            str(entry.get("status_code", "")) if "status" in group_by else "",
+        )
+        hist = groups.get(key)
+        if hist is None:
+            hist = groups[key] = LatencyHistogram()
+        hist.record(duration)
+
+        day_key = (entry["_ts"].strftime("%Y-%m-%d"), route)
+        day_hist = daily.get(day_key)
+        if day_hist is None:
+            day_hist = daily[day_key] = LatencyHistogram()
+        day_hist.record(duration)
+
+        if slowest > 0:
+            seq += 1
+            item = (duration, seq, {
+                "timestamp": entry["timestamp"],
+                "endpoint": entry.get("endpoint", route),
+                "status_code": entry.get("status_code"),
+                "duration_ms": duration,
+            })
+            if len(slow_heap) < slowest:
+                heapq.heappush(slow_heap, item)
+            elif duration > slow_heap[0][0]:
+                heapq.heapreplace(slow_heap, item)
+
+    slow = [item[2] for item in sorted(slow_heap, reverse=True)]
+    return groups, daily, slow
+
+
+def summarize(hist: LatencyHistogram) -> dict:
+    result = {
+        "count": hist.count,
+        "avg_ms": round(hist.total / hist.count, 2) if hist.count else 0.0,
+        "max_ms": round(hist.max, 2),
+    }
+    for label, q in PERCENTILES:
+        result[f"{label}_ms"] = round(hist.percentile(q), 2)
+    return result
+
+
+def compare_days(daily: dict, baseline: str, current: str, threshold: float, metric: str) -> list:
+    """比較兩天同一路由的分位數，ratio 超過 threshold 視為退步"""
+    routes = sorted({route for day, route in daily if day in (baseline, current)})
+    rows = []
+    for route in routes:
+        before = daily.get((baseline, route))
+        after = daily.get((current, route))
+        if before is None or after is None:
+            continue
+        before_value = summarize(before)[metric]
+        after_value = summarize(after)[metric]
+        ratio = after_value / before_value if before_value else float("inf")
+        rows.append({
+            "endpoint": route,
+            "baseline_ms": before_value,
+            "current_ms": after_value,
+            "ratio": round(ratio, 2),
+            "regressed": ratio > 1 + threshold,
+        })
+    rows.sort(key=lambda r: r["ratio"], reverse=True)
+    return rows
+
+
+def print_report(groups, slow, comparison, baseline, current, metric):
+    print("\n" + "=" * 100)
+    print("📊 API Profiling Log Analysis")
+    print("=" * 100)
+
+    if not groups:
+        print("沒有可分析的日誌")
+        return
+
+    header = f"{'Window':<17} {'Endpoint':<42} {'Status':>6} {'Count':>7} {'p50':>9} {'p90':>9} {'p99':>9} {'p999':>9}"
+    print("\n" + header)
+    print("-" * len(header))
+    for (bucket, route, status_code), hist in sorted(groups.items()):
+        s = summarize(hist)
+        print(f"{bucket or '-':<17} {route or '(all)':<42} {status_code or '-':>6} {s['count']:>7} "
+              f"{s['p50_ms']:>9.2f} {s['p90_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['p999_ms']:>9.2f}")
+
+    if slow:
+        print(f"\n🐢 最慢的 {len(slow)} 筆請求")
+        print("-" * 100)
+        for item in slow:
+            print(f"{item['duration_ms']:>10.2f} ms  {item['status_code']!s:>4}  {item['timestamp']}  {item['endpoint']}")
+
+    if comparison is not None:
+        print(f"\n📈 逐日比較（{metric}）：{baseline} → {current}")
+        print("-" * 100)
+        if not comparison:
+            print("兩天沒有共同的端點")
+        for row in comparison:
+            flag = "⚠️ " if row["regressed"] else "  "
+            print(f"{flag}{row['endpoint']:<52} {row['baseline_ms']:>9.2f} → {row['current_ms']:>9.2f}  x{row['ratio']}")
+
+    print("=" * 100 + "\n")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="分析 profiling_logs 的 JSONL 日誌")
+    parser.add_argument("paths", nargs="*", help="日誌檔、目錄或萬用字元（預設 profiling_logs/）")
+    parser.add_argument("--group-by", default="route", help="以逗號分隔：route,status（預設 route）")
+    parser.add_argument("--window", choices=sorted(WINDOW_FORMATS), default="none", help="時間分組粒度")
+    parser.add_argument("--slowest", type=int, default=10, help="列出最慢的 N 筆請求（0 表示不列出）")
+    parser.add_argument("--compare", action="store_true", help="比較兩天的分位數找出退步端點")
+    parser.add_argument("--baseline", help="比較基準日 YYYY-MM-DD（預設倒數第二天）")
+    parser.add_argument("--current", help="比較目標日 YYYY-MM-DD（預設最後一天）")
+    parser.add_argument("--metric", default="p90_ms", choices=[f"{label}_ms" for label, _ in PERCENTILES])
+    parser.add_argument("--threshold", type=float, default=0.2, help="退步門檻（0.2 表示慢 20%%）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 輸出")
+    args = parser.parse_args(argv)
+
+    files = expand_paths(args.paths)
+    if not files:
+        print("[X] 找不到日誌檔案", file=sys.stderr)
+        return 1
+
+    group_by = {g.strip() for g in args.group_by.split(",") if g.strip()}
+    groups, daily, slow = analyze(iter_entries(files), group_by, args.window, args.slowest)
+
+    comparison = None
+    baseline = current = None
+    if args.compare:
+        days = sorted({day for day, _ in daily})
+        current = args.current or (days[-1] if days else None)
+        baseline = args.baseline or (days[-2] if len(days) >= 2 else None)
+        if baseline and current:
+            comparison = compare_days(daily, baseline, current, args.threshold, args.metric)
+        else:
+            comparison = []
+
+    if args.json:
+        print(json.dumps({
+            "files": files,
+            "groups": [
+                {"window": bucket, "endpoint": route, "status_code": status_code, **summarize(hist)}
+                for (bucket, route, status_code), hist in sorted(groups.items())
+            ],
+            "slowest": slow,
+            "comparison": {"baseline": baseline, "current": current, "rows": comparison}
+            if comparison is not None else None,
+        }, ensure_ascii=False, indent=2))
+    else:
+        print_report(groups, slow, comparison, baseline, current, args.metric)
+
+    if comparison and any(row["regressed"] for row in comparison):
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,7 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
@@ -6,6 +10,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from database import get_db
+from cache import TTLCache
 from dotenv import load_dotenv
 import os
 
@@ -15,18 +20,82 @@ JWT_SECRET = os.getenv("JWT_SECRET", "change-this-secret-key")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRES_MINUTES = int(os.getenv("JWT_EXPIRES_MINUTES", "15"))
 REFRESH_TOKEN_EXPIRES_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRES_DAYS", "7"))
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "1024"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
 
 bearer_scheme = HTTPBearer()
 
 
+@dataclass(frozen=True)
+class CurrentUser:
+    """已驗證用戶的快照（不綁定 Session，可安全地跨請求快取）"""
+    id: str
+    email: str
+    role: str
+
+
+# user_id -> CurrentUser；沒有主動失效，角色或 Email 的變更（如離線腳本修改）在 USER_CACHE_TTL_SECONDS 內生效
+user_cache = TTLCache(USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_SIZE)
+
+
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
 
 
 def verify_password(plain: str, hashed: str) -> bool:
     return bcrypt.checkpw(plain.encode(), hashed.encode())
 
 
+def needs_rehash(hashed: str) -> bool:
+    """雜湊的 cost factor 與目前設定的 BCRYPT_ROUNDS 不同時回傳 True"""
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+# bcrypt 專用的固定大小執行緒池，限制同時執行的雜湊數，避免登入尖峰吃滿 CPU 或佔住同步端點共用的 threadpool
+_password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+)
+_password_pending = 0
+_password_pending_lock = threading.Lock()
+
+
+async def _run_password_task(func, *args):
+    """在 bcrypt 執行緒池執行並 await 結果；等待期間不佔用 event loop 與 FastAPI threadpool"""
+    global _password_pending
+    with _password_pending_lock:
+        _password_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+    finally:
+        with _password_pending_lock:
+            _password_pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_password_task(hash_password, password)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await _run_password_task(verify_password, plain, hashed)
+
+
+def password_pool_stats() -> dict:
+    """密碼執行緒池狀態：queue_depth 為排隊中與執行中的工作總數"""
+    with _password_pending_lock:
+        pending = _password_pending
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "queue_depth": pending,
+        "rounds": BCRYPT_ROUNDS,
+    }
+
+
 def create_access_token(user_id: str) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=JWT_EXPIRES_MINUTES)
     payload = {"sub": user_id, "exp": expire, "type": "access"}
@@ -58,7 +127,11 @@ async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
     db: Session = Depends(get_db)
 ):
-    """FastAPI 依賴注入：從 Bearer Token 取得當前用戶"""
+    """FastAPI 依賴注入：從 Bearer Token 取得當前用戶
+
+    命中快取時不查詢資料庫；回傳 CurrentUser（id、email、role）。
+    快取項目只在 TTL 到期時失效，因此角色或 Email 變更最多延遲 USER_CACHE_TTL_SECONDS 才生效。
+    """
     from models import User
 
     token = credentials.credentials
@@ -71,11 +144,17 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = db.query(User).filter(User.id == user_id).first()
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    user = db.query(User.id, User.email, User.role).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用戶不存在",
         )
 
-    return user
+    current = CurrentUser(id=user.id, email=user.email, role=user.role)
+    user_cache.set(user_id, current)
+    return current
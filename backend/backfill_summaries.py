@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+預先摘要補齊工具
+背景 worker 只處理上線後新增或修改的紀錄；既有紀錄（或 prompt、模型變更後雜湊失效的紀錄）用此工具補齊，
+上游併發與 worker 相同，受 PRESUMMARIZE_CONCURRENCY 限制
+
+用法：
+    python backfill_summaries.py                 # 補齊所有用戶
+    python backfill_summaries.py owner@example.com
+"""
+import asyncio
+import sys
+
+from database import SessionLocal, engine, Base
+from models import User
+import http_client
+import presummarize
+from routers import llm
+
+
+async def backfill(record_ids: list) -> dict:
+    counts = {"processed": 0, "skipped": 0, "failed": 0}
+    remaining = iter(record_ids)
+
+    async def worker():
+        for record_id in remaining:
+            try:
+                counts[await presummarize.summarize_record(record_id)] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"[X] {record_id}：{e}")
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(presummarize.PRESUMMARIZE_CONCURRENCY)))
+    finally:
+        await http_client.close_client()
+    return counts
+
+
+def main() -> int:
+    if not llm.OPENAI_API_KEY:
+        print("[X] 未設定 OPENAI_API_KEY")
+        return 1
+
+    Base.metadata.create_all(bind=engine)
+    user_id = None
+    if len(sys.argv) > 1:
+        db = SessionLocal()
+        try:
+            user = db.query(User).filter(User.email == sys.argv[1]).first()
+        finally:
+            db.close()
+        if not user:
+            print(f"[X] 找不到用戶：{sys.argv[1]}")
+            return 1
+        user_id = user.id
+
+    record_ids = presummarize.stale_record_ids(user_id)
+    print(f"[..] 需要摘要的紀錄：{len(record_ids)} 筆")
+    counts = asyncio.run(backfill(record_ids))
+    print(f"[OK] 完成 {counts['processed']} 筆，略過 {counts['skipped']} 筆，失敗 {counts['failed']} 筆")
+    return 0 if counts["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
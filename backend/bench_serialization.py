@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+紀錄列表序列化微基準
+比較舊路徑（isoformat + json.loads + jsonable_encoder + JSONResponse）與
+目前的 fast_json 路徑（orjson 直接序列化 datetime 與 dict），以每秒處理筆數呈現
+
+用法：
+    python bench_serialization.py                 # 預設 10k 筆、取 5 次中最快的一次
+    python bench_serialization.py --rows 50000 --repeat 3
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import fast_json
+from models import Record
+from routers.records import record_to_dict
+
+
+def legacy_record_to_dict(r: Record, *, has_commented: bool = False) -> dict:
+    """改用 fast_json 之前的 record_to_dict"""
+    return {
+        "id": r.id,
+        "user_id": r.user_id,
+        "date": r.date,
+        "startTime": r.start_time,
+        "endTime": r.end_time,
+        "title": r.title,
+        "content": r.content,
+        "tags": json.loads(r.tags) if r.tags else [],
+        "createdAt": r.created_at.isoformat() if r.created_at else None,
+        "updatedAt": r.updated_at.isoformat() if r.updated_at else None,
+        "hasCommented": has_commented,
+    }
+
+
+def make_records(count: int) -> list:
+    start = datetime(2024, 1, 1, 9, 0, 0)
+    records = []
+    for i in range(count):
+        created = start + timedelta(days=i // 3, minutes=i % 3, microseconds=i)
+        records.append(Record(
+            id=f"00000000-0000-0000-0000-{i:012d}",
+            user_id="bench-owner",
+            date=created.strftime("%Y-%m-%d"),
+            start_time="09:00",
+            end_time="18:00",
+            title=f"第 {i + 1} 天：資料庫與前端",
+            content="今天處理資料庫與前端相關工作，並整理部署文件。" * 5,
+            tags=json.dumps(["資料庫", "前端"], ensure_ascii=False),
+            created_at=created,
+            updated_at=created + timedelta(hours=1) if i % 2 else None,
+        ))
+    return records
+
+
+def legacy_path(records: list) -> bytes:
+    content = {"records": [legacy_record_to_dict(r) for r in records], "total": len(records), "next_cursor": None}
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast_path(records: list) -> bytes:
+    content = {"records": [record_to_dict(r) for r in records], "total": len(records), "next_cursor": None}
+    return fast_json.json_response(content).body
+
+
+def measure(fn, records: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(records)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="紀錄列表序列化微基準")
+    parser.add_argument("--rows", type=int, default=10_000, help="紀錄筆數")
+    parser.add_argument("--repeat", type=int, default=5, help="重複次數（取最快）")
+    args = parser.parse_args(argv)
+
+    records = make_records(args.rows)
+    if json.loads(legacy_path(records)) != json.loads(fast_path(records)):
+        print("[X] 兩種路徑的輸出不一致", file=sys.stderr)
+        return 1
+
+    print("\n" + "=" * 70)
+    print(f"🧪 Record list serialization ({args.rows} rows, best of {args.repeat})")
+    print(f"   orjson：{'已啟用' if fast_json.orjson is not None else '未安裝（退回標準 json）'}")
+    print("=" * 70)
+    legacy = measure(legacy_path, records, args.repeat)
+    fast = measure(fast_path, records, args.repeat)
+    for label, elapsed in (("before (jsonable_encoder)", legacy), ("after (fast_json)", fast)):
+        print(f"{label:<28} {elapsed * 1000:>9.1f} ms  {args.rows / elapsed:>12,.0f} rows/s")
+    print(f"{'speedup':<28} {legacy / fast:>9.2f}x")
+    print("=" * 70 + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+mySite API 基準測試
+在同一行程內透過 ASGI transport 對已植入資料的 SQLite 資料庫施壓，
+以 N 個併發虛擬用戶測量各端點的吞吐量與延遲分位數，並可與基準結果比較
+
+用法：
+    python benchmark.py                                   # 預設 10k 紀錄、50k 留言、10 個虛擬用戶
+    python benchmark.py --records 2000 --comments 5000 --users 20 --output result.json
+    python benchmark.py --baseline bench_baseline.json --threshold 0.2   # p95 慢 20% 或每請求 SQL 數增加時失敗
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+SCENARIOS = ("list", "list_page", "search", "adjacent", "detail", "comments", "stats", "login")
+
+OWNER_EMAIL = "bench-owner@example.com"
+VIEWER_EMAIL = "bench-viewer@example.com"
+BENCH_PASSWORD = "bench-password"
+
+# 每請求平均 SQL 數容許的增加量（超過視為出現 N+1 之類的退步）
+MAX_QUERY_INCREASE = 0.5
+
+SEARCH_WORDS = ["資料庫", "前端", "部署", "會議", "測試", "重構", "API", "文件", "效能", "除錯"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="mySite API 基準測試")
+    parser.add_argument("--records", type=int, default=10_000, help="植入的紀錄數")
+    parser.add_argument("--comments", type=int, default=50_000, help="植入的留言數")
+    parser.add_argument("--users", type=int, default=10, help="併發虛擬用戶數")
+    parser.add_argument("--requests", type=int, default=200, help="每個情境的總請求數")
+    parser.add_argument("--login-requests", type=int, default=20, help="login 情境的總請求數（bcrypt 較慢）")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="以逗號分隔要執行的情境")
+    parser.add_argument("--db", help="SQLite 檔案路徑（預設建立暫存檔，已存在時沿用不重新植入）")
+    parser.add_argument("--seed", type=int, default=42, help="亂數種子")
+    parser.add_argument("--output", help="將結果寫入 JSON 檔")
+    parser.add_argument("--baseline", help="基準結果 JSON；任一情境 p95 或每請求 SQL 數退步即以非零結束")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p95 退步門檻（0.2 表示慢 20%%）")
+    return parser.parse_args(argv)
+
+
+def seed_database(record_count: int, comment_count: int, rng: random.Random) -> None:
+    """以 Core 批次寫入植入 owner、viewer、紀錄與留言"""
+    from database import engine, Base
+    from models import User, Record, Comment, Profile, gen_id
+    from auth import hash_password
+
+    Base.metadata.create_all(bind=engine)
+    password_hash = hash_password(BENCH_PASSWORD)
+    owner_id, viewer_id = gen_id(), gen_id()
+    start_day = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": owner_id, "email": OWNER_EMAIL, "password_hash": password_hash, "role": "owner"},
+            {"id": viewer_id, "email": VIEWER_EMAIL, "password_hash": password_hash, "role": "viewer"},
+        ])
+        conn.execute(Profile.__table__.insert(), [
+            {"id": gen_id(), "user_id": owner_id},
+            {"id": gen_id(), "user_id": viewer_id},
+        ])
+
+        record_ids = []
+        batch = []
+        for i in range(record_count):
+            record_id = gen_id()
+            record_ids.append(record_id)
+            day = start_day + timedelta(days=i // 3)
+            words = rng.sample(SEARCH_WORDS, 3)
+            batch.append({
+                "id": record_id,
+                "user_id": owner_id,
+                "date": day.strftime("%Y-%m-%d"),
+                "start_time": "09:00",
+                "end_time": "18:00",
+                "title": f"第 {i + 1} 天：{words[0]}",
+                "content": f"今天處理{words[0]}與{words[1]}相關工作，並整理{words[2]}。" * 5,
+                "tags": json.dumps(words[:2], ensure_ascii=False),
+                "created_at": day + timedelta(hours=9, minutes=i % 3),
+            })
+            if len(batch) >= 2000:
+                conn.execute(Record.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(Record.__table__.insert(), batch)
+
+        batch = []
+        for i in range(comment_count if record_ids else 0):
+            batch.append({
+                "id": gen_id(),
+                "record_id": rng.choice(record_ids),
+                "user_id": viewer_id if i % 2 else owner_id,
+                "content": f"留言 {i + 1}",
+            })
+            if len(batch) >= 5000:
+                conn.execute(Comment.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(Comment.__table__.insert(), batch)
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[idx]
+
+
+async def run_scenario(client, name: str, total: int, users: int, make_request) -> dict:
+    """以 users 個虛擬用戶平均分攤 total 個請求，回傳延遲、吞吐量與每請求 SQL 數"""
+    from database import engine
+    from db_utils import StatementCounter
+
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def virtual_user():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    with StatementCounter(engine) as statements:
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user() for _ in range(max(1, users))))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        "queries_per_request": round(statements.count / len(latencies), 2) if latencies else 0.0,
+    }
+
+
+async def run_benchmark(args) -> dict:
+    import httpx
+    from main import app
+    from database import SessionLocal
+    from models import Record
+
+    db = SessionLocal()
+    try:
+        record_ids = [row[0] for row in db.query(Record.id).all()]
+    finally:
+        db.close()
+    if not record_ids:
+        raise SystemExit("[X] 資料庫沒有紀錄，無法進行基準測試")
+
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        login = await client.post("/api/auth/login", json={"email": VIEWER_EMAIL, "password": BENCH_PASSWORD})
+        login.raise_for_status()
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        requests = {
+            "list": lambda c, i: c.get("/api/records", headers=headers),
+            "list_page": lambda c, i: c.get("/api/records", params={"limit": 50}, headers=headers),
+            "search": lambda c, i: c.get(
+                "/api/records", params={"search": rng.choice(SEARCH_WORDS), "limit": 50}, headers=headers
+            ),
+            "adjacent": lambda c, i: c.get(f"/api/records/{rng.choice(record_ids)}/adjacent", headers=headers),
+            "detail": lambda c, i: c.get(f"/api/records/{rng.choice(record_ids)}", headers=headers),
+            "comments": lambda c, i: c.get(f"/api/records/{rng.choice(record_ids)}/comments", headers=headers),
+            "stats": lambda c, i: c.get("/api/records/stats", headers=headers),
+            "login": lambda c, i: c.post(
+                "/api/auth/login", json={"email": VIEWER_EMAIL, "password": BENCH_PASSWORD}
+            ),
+        }
+
+        selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+        unknown = [s for s in selected if s not in requests]
+        if unknown:
+            raise SystemExit(f"[X] 未知的情境：{', '.join(unknown)}")
+
+        results = {}
+        for name in selected:
+            total = args.login_requests if name == "login" else args.requests
+            # 暖機一次，避免首次查詢計畫與連線建立干擾結果
+            await requests[name](client, -1)
+            results[name] = await run_scenario(client, name, total, args.users, requests[name])
+            r = results[name]
+            print(f"   {name:<10} {r['requests']:>6} req  {r['rps']:>9.2f} req/s  "
+                  f"p50 {r['p50_ms']:>8.2f}  p95 {r['p95_ms']:>8.2f}  p99 {r['p99_ms']:>8.2f} ms  "
+                  f"sql/req {r['queries_per_request']:>5.2f}  errors {r['errors']}")
+
+    return results
+
+
+def compare_with_baseline(results: dict, baseline_path: str, threshold: float) -> list:
+    """回傳 p95 退步超過門檻，或每請求 SQL 數增加（如出現 N+1）的情境"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f).get("scenarios", {})
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base.get("p95_ms"):
+            ratio = result["p95_ms"] / base["p95_ms"]
+            if ratio > 1 + threshold:
+                regressions.append({"scenario": name, "metric": "p95_ms", "baseline": base["p95_ms"],
+                                    "current": result["p95_ms"], "ratio": round(ratio, 2)})
+        base_queries = base.get("queries_per_request")
+        if base_queries is not None and result["queries_per_request"] > base_queries + MAX_QUERY_INCREASE:
+            regressions.append({"scenario": name, "metric": "queries_per_request", "baseline": base_queries,
+                                "current": result["queries_per_request"],
+                                "ratio": round(result["queries_per_request"] / base_queries, 2) if base_queries else None})
+    return regressions
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    # 資料庫位置必須在匯入 database 之前決定
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="mysite-bench-"), "bench.db")
+    needs_seed = not os.path.exists(db_path)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("OWNER_EMAIL", OWNER_EMAIL)
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(backend_dir)
+    sys.path.insert(0, backend_dir)
+
+    print("\n" + "=" * 80)
+    print("🏁 mySite API Benchmark")
+    print("=" * 80)
+    print(f"資料庫：{db_path}")
+
+    if needs_seed:
+        started = time.perf_counter()
+        seed_database(args.records, args.comments, random.Random(args.seed))
+        print(f"已植入 {args.records} 筆紀錄、{args.comments} 則留言（{time.perf_counter() - started:.1f}s）")
+
+    print(f"虛擬用戶：{args.users}，每情境請求數：{args.requests}\n")
+    results = asyncio.run(run_benchmark(args))
+
+    output = {
+        "timestamp": datetime.now().isoformat(),
+        "config": {
+            "records": args.records,
+            "comments": args.comments,
+            "users": args.users,
+            "requests": args.requests,
+            "login_requests": args.login_requests,
+        },
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+        print(f"\n結果已寫入 {args.output}")
+
+    exit_code = 0
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.threshold)
+        if regressions:
+            print("\n⚠️  與基準相比出現退步：")
+            for r in regressions:
+                print(f"   {r['scenario']:<10} {r['metric']:<20} {r['baseline']:>8.2f} → {r['current']:>8.2f}  x{r['ratio']}")
+            exit_code = 1
+        else:
+            print("\n✅ 與基準相比沒有退步")
+
+    print("=" * 80 + "\n")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
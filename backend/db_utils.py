@@ -0,0 +1,23 @@
+"""
+資料庫輔助工具
+供基準測試與測試共用，不匯入 database，可在設定 DATABASE_URL 之前載入
+"""
+from sqlalchemy import event
+
+
+class StatementCounter:
+    """計算期間內執行的 SQL 陳述式數量，用來偵測 N+1 查詢的退步"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
@@ -0,0 +1,53 @@
+"""
+條件式請求（ETag / If-None-Match）
+ETag 由可見範圍內各 owner 的資料版本、目前用戶與請求路徑參數雜湊而成；
+If-None-Match 相符時只做一次版本主鍵查詢即回 304，不執行主要查詢
+"""
+import hashlib
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+
+from auth import CurrentUser, get_current_user
+from database import get_db
+from owners import visible_owner_ids
+from versions import get_versions
+
+# 瀏覽器可快取，但每次使用前都須帶 If-None-Match 重新驗證
+CACHE_CONTROL = "private, no-cache"
+
+
+def compute_etag(request: Request, db: Session, current_user: CurrentUser) -> str:
+    versions = get_versions(db, visible_owner_ids(db, current_user))
+    parts = [
+        current_user.id,  # hasCommented 等欄位因人而異
+        request.url.path,
+        repr(sorted(request.query_params.multi_items())),
+        *(f"{owner_id}:{version}" for owner_id, version in versions.items()),
+    ]
+    return '"' + hashlib.sha256("|".join(parts).encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 採弱比較：忽略 W/ 前綴，* 代表任何版本"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def etag_guard(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """讀取端點的依賴：內容未變時以 304 中止請求，否則在回應加上 ETag"""
+    etag = compute_etag(request, db, current_user)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
@@ -0,0 +1,54 @@
+"""
+快速 JSON 回應
+大型列表端點直接以 ORJSONResponse 序列化（datetime 由 orjson 原生輸出 ISO 8601），
+略過 FastAPI 的 jsonable_encoder 逐欄位走訪；未安裝 orjson 時退回標準 json
+"""
+import json
+from typing import Optional
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(ORJSONResponse):
+    """即 FastAPI 的 ORJSONResponse；未安裝 orjson 時改以標準 json 輸出"""
+
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return dumps(content)
+        return super().render(content)
+
+
+# 不從注入的 Response 沿用的標頭：由新回應依內容自行產生
+_SKIPPED_HEADERS = (b"content-length", b"content-type")
+
+
+def json_response(content, response: Optional[Response] = None, status_code: int = 200) -> FastJSONResponse:
+    """直接回傳已序列化的回應；response 為端點注入的 Response，沿用其上設定的標頭（如 ETag）
+
+    複製 raw_headers 而非 headers.items()，重複的標頭（如多個 Set-Cookie）才不會被合併掉。
+    """
+    result = FastJSONResponse(content, status_code=status_code)
+    if response is not None:
+        result.raw_headers.extend(
+            (name, value) for name, value in response.raw_headers if name not in _SKIPPED_HEADERS
+        )
+    return result
@@ -0,0 +1,32 @@
+"""
+實習時數計算
+與前端週報（js/pdf-exporter.js）的工時規則一致：
+未填時間時預設 09:00–18:00，工作超過 4 小時扣除 1 小時午休
+"""
+import re
+from typing import Optional
+
+DEFAULT_START_TIME = "09:00"
+DEFAULT_END_TIME = "18:00"
+LUNCH_BREAK_THRESHOLD_HOURS = 4
+LUNCH_BREAK_HOURS = 1
+
+_HOUR_MINUTE = re.compile(r"^(\d{1,2}):(\d{2})$")
+
+
+def parse_hour_minute(value: Optional[str], fallback: str) -> Optional[int]:
+    """將 "HH:MM" 轉為當日分鐘數，格式錯誤時回傳 None"""
+    raw = (value or fallback or "").strip()
+    match = _HOUR_MINUTE.match(raw)
+    if not match:
+        return None
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+
+def calculate_record_hours(start_time: Optional[str], end_time: Optional[str]) -> float:
+    start = parse_hour_minute(start_time, DEFAULT_START_TIME)
+    end = parse_hour_minute(end_time, DEFAULT_END_TIME)
+    if start is None or end is None or end <= start:
+        return 0.0
+    duration = (end - start) / 60
+    return duration - LUNCH_BREAK_HOURS if duration > LUNCH_BREAK_THRESHOLD_HOURS else duration
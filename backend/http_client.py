@@ -0,0 +1,91 @@
+"""
+共用的對外 HTTP client（OpenAI 代理）
+於 app lifespan 建立、關閉時釋放；連線保持 keep-alive 重複使用，
+避免每次摘要都重新做 DNS、TCP 與 TLS 交握
+"""
+import os
+from typing import Optional
+
+import httpx
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "10"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "false").lower() in ("1", "true", "yes")
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "30"))
+OPENAI_WRITE_TIMEOUT = float(os.getenv("OPENAI_WRITE_TIMEOUT", "10"))
+OPENAI_POOL_TIMEOUT = float(os.getenv("OPENAI_POOL_TIMEOUT", "5"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_client() -> httpx.AsyncClient:
+    # HTTP/2 需要 h2 套件（pip install httpx[http2]），未安裝時退回 HTTP/1.1
+    http2 = OPENAI_HTTP2 and _http2_available()
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            connect=OPENAI_CONNECT_TIMEOUT,
+            read=OPENAI_READ_TIMEOUT,
+            write=OPENAI_WRITE_TIMEOUT,
+            pool=OPENAI_POOL_TIMEOUT,
+        ),
+    )
+
+
+async def start_client() -> None:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_client()
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """取得共用 client；未經 lifespan 啟動時（如 ASGITransport 測試）於首次使用時建立"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_client()
+    return _client
+
+
+def pool_stats() -> dict:
+    """連線池狀態：設定上限、目前連線數（閒置／使用中）與進行中（含等待連線）的請求數"""
+    stats = {
+        "max_connections": OPENAI_MAX_CONNECTIONS,
+        "max_keepalive_connections": OPENAI_MAX_KEEPALIVE,
+        "http2": OPENAI_HTTP2 and _http2_available(),
+        "open": _client is not None and not _client.is_closed,
+        "connections": 0,
+        "idle_connections": 0,
+        "requests_in_flight": 0,
+    }
+    if not stats["open"]:
+        return stats
+    pool = getattr(_client._transport, "_pool", None)  # httpcore.AsyncConnectionPool
+    if pool is None:
+        return stats
+    connections = list(pool.connections)
+    stats["connections"] = len(connections)
+    stats["idle_connections"] = sum(1 for conn in connections if conn.is_idle())
+    stats["requests_in_flight"] = len(getattr(pool, "_requests", ()))
+    return stats
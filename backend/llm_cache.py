@@ -0,0 +1,131 @@
+"""
+LLM 摘要快取
+以 (system prompt, model, 參數, 內容) 的雜湊為 key 存在資料庫，跨重啟保留；
+超過 TTL 的項目視為未命中，筆數超過上限時淘汰最久未使用者（LRU）；
+淘汰每隔 LLM_CACHE_EVICT_INTERVAL 秒最多執行一次，不在每次寫入時掃描整張表。
+函式皆為同步的資料庫存取，async 端點須以 asyncio.to_thread 呼叫
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import LLMSummaryCache
+
+LLM_CACHE_TTL_DAYS = int(os.getenv("LLM_CACHE_TTL_DAYS", "90"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_EVICT_INTERVAL = int(os.getenv("LLM_CACHE_EVICT_INTERVAL", "300"))
+
+_stats_lock = threading.Lock()
+_hits = 0
+_misses = 0
+_last_evicted = None   # time.monotonic()；None 表示本行程尚未淘汰過
+
+
+def cache_key(system_prompt: str, model: str, params: dict, content: str) -> str:
+    raw = json.dumps([system_prompt, model, params, content], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _expired(created_at: datetime, now: datetime) -> bool:
+    return created_at.replace(tzinfo=timezone.utc) < now - timedelta(days=LLM_CACHE_TTL_DAYS)
+
+
+def get_cached_summary(db: Session, key: str) -> Optional[str]:
+    """命中時更新最後使用時間與命中次數並回傳摘要；過期項目直接刪除"""
+    return get_cached_summaries(db, [key]).get(key)
+
+
+def get_cached_summaries(db: Session, keys) -> dict:
+    """批次查詢，回傳命中的 {key: 摘要}；讓 async 端點只需一次 to_thread
+
+    以一次 IN 查詢取出所有 key，命中與過期項目各以一個陳述式更新／刪除，最後只 commit 一次。
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    now = datetime.now(timezone.utc)
+    rows = db.query(LLMSummaryCache.key, LLMSummaryCache.summary, LLMSummaryCache.created_at).filter(
+        LLMSummaryCache.key.in_(keys)
+    ).all()
+    results = {}
+    expired = []
+    for key, summary, created_at in rows:
+        if _expired(created_at, now):
+            expired.append(key)
+        else:
+            results[key] = summary
+
+    if expired:
+        db.query(LLMSummaryCache).filter(LLMSummaryCache.key.in_(expired)).delete(synchronize_session=False)
+    if results:
+        db.query(LLMSummaryCache).filter(LLMSummaryCache.key.in_(list(results))).update(
+            {LLMSummaryCache.last_used_at: now, LLMSummaryCache.hit_count: LLMSummaryCache.hit_count + 1},
+            synchronize_session=False,
+        )
+    if expired or results:
+        db.commit()
+
+    global _hits, _misses
+    with _stats_lock:
+        _hits += len(results)
+        _misses += len(keys) - len(results)
+    return results
+
+
+def _eviction_due() -> bool:
+    global _last_evicted
+    now = time.monotonic()
+    with _stats_lock:
+        if _last_evicted is not None and now - _last_evicted < LLM_CACHE_EVICT_INTERVAL:
+            return False
+        _last_evicted = now
+        return True
+
+
+def store_summary(db: Session, key: str, model: str, summary: str) -> None:
+    store_summaries(db, model, {key: summary})
+
+
+def store_summaries(db: Session, model: str, summaries: dict) -> None:
+    """寫入 {key: 摘要}；距上次淘汰超過 LLM_CACHE_EVICT_INTERVAL 秒時順便淘汰"""
+    if not summaries:
+        return
+    now = datetime.now(timezone.utc)
+    for key, summary in summaries.items():
+        db.merge(LLMSummaryCache(
+            key=key, model=model, summary=summary, hit_count=0, created_at=now, last_used_at=now,
+        ))
+    db.commit()
+    if _eviction_due():
+        evict(db)
+
+
+def evict(db: Session) -> int:
+    """刪除過期項目與超出上限的最久未使用項目，回傳刪除筆數"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=LLM_CACHE_TTL_DAYS)
+    removed = db.query(LLMSummaryCache).filter(LLMSummaryCache.created_at < cutoff).delete(
+        synchronize_session=False
+    )
+    overflow = db.query(func.count(LLMSummaryCache.key)).scalar() - LLM_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        oldest = db.query(LLMSummaryCache.key).order_by(LLMSummaryCache.last_used_at.asc()).limit(overflow)
+        removed += db.query(LLMSummaryCache).filter(LLMSummaryCache.key.in_(oldest.scalar_subquery())).delete(
+            synchronize_session=False
+        )
+    db.commit()
+    return removed
+
+
+def cache_stats(db: Optional[Session] = None) -> dict:
+    with _stats_lock:
+        result = {"hits": _hits, "misses": _misses}
+    if db is not None:
+        result["entries"] = db.query(func.count(LLMSummaryCache.key)).scalar()
+    return result
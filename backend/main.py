@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -7,7 +8,13 @@ from sqlalchemy import text
 import os
 
 from database import engine, Base
-from routers import auth, records, profile, llm, comments
+from search import setup_fts
+from summaries import ensure_summaries
+from tags import migrate_tags
+from auth import password_pool_stats
+import http_client
+import presummarize
+from routers import auth, records, profile, llm, comments, metrics, reports, sync
 
 load_dotenv()
 
@@ -29,10 +36,63 @@ try:
 except Exception:
     pass  # 欄位已存在，忽略
 
+try:
+    with engine.connect() as conn:
+        conn.execute(text("ALTER TABLE records ADD COLUMN summary_hash VARCHAR(64)"))
+        conn.commit()
+except Exception:
+    pass  # 欄位已存在，忽略
+
+# 增量同步用的版本欄位
+for table in ("records", "comments"):
+    try:
+        with engine.connect() as conn:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+            conn.commit()
+    except Exception:
+        pass  # 欄位已存在，忽略
+
+# 舊資料庫補上索引（create_all 不會替既有資料表建索引）
+with engine.connect() as conn:
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_records_user_date_created_id "
+        "ON records (user_id, date, created_at, id)"
+    ))
+    # 舊版索引不含 id，以 id 打破平手時仍需排序，由上面的新索引取代
+    conn.execute(text("DROP INDEX IF EXISTS ix_records_user_date_created"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_records_user_version ON records (user_id, version)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_comments_version ON comments (version)"))
+    conn.commit()
+
+# 建立（必要時重建）紀錄全文檢索索引
+setup_fts(engine)
+
+# 舊資料的 JSON 標籤遷移到 tags / record_tags
+migrate_tags(engine)
+
+# 彙總表與紀錄筆數不符時（首次升級或手動改過資料）重建
+ensure_summaries(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 對外 HTTP client 與 app 同生命週期，關閉時釋放 keep-alive 連線
+    await http_client.start_client()
+    llm.start_upstream_limit()
+    presummarize.start_worker()
+    try:
+        yield
+    finally:
+        await presummarize.stop_worker()
+        llm.stop_upstream_limit()
+        await http_client.close_client()
+
+
 app = FastAPI(
     title="mySite API",
     description="實習紀錄管理系統後端 API",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan,
 )
 
 # CORS 設定：允許前端跨域請求
@@ -58,11 +118,18 @@ app.include_router(records.router)
 app.include_router(profile.router)
 app.include_router(llm.router)
 app.include_router(comments.router)
+app.include_router(reports.router)
+app.include_router(sync.router)
+app.include_router(metrics.router)
 
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "password_pool": password_pool_stats(),
+        "http_pool": http_client.pool_stats(),
+    }
 
 
 # 提供前端靜態檔案（放在最後，避免攔截 API 路由）
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, UniqueConstraint
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, UniqueConstraint, Index, Integer, Float
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -34,12 +34,40 @@ class Record(Base):
     title = Column(String, nullable=False)
     content = Column(Text, nullable=False)
     tags = Column(Text, default="[]")              # JSON 字串
-    feedback = Column(Text, nullable=True)
+    feedback = Column(Text, nullable=True)         # 背景預先產生的 LLM 摘要
+    summary_hash = Column(String(64), nullable=True)  # feedback 所依據內容的雜湊，內容變更後即失效
+    version = Column(Integer, nullable=False, default=0, server_default="0")  # 最後寫入時 owner 的資料版本
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     user = relationship("User", back_populates="records")
 
+    __table_args__ = (
+        # 時間軸排序與上/下一篇查詢用的複合索引
+        Index("ix_records_user_date_created_id", "user_id", "date", "created_at", "id"),
+        # 增量同步：取出某版本之後變動的紀錄
+        Index("ix_records_user_version", "user_id", "version"),
+    )
+
+
+class Tag(Base):
+    __tablename__ = "tags"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, unique=True, nullable=False, index=True)
+
+
+class RecordTag(Base):
+    """紀錄與標籤的關聯；(tag_id, record_id) 即標籤的反向索引"""
+    __tablename__ = "record_tags"
+
+    tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+    record_id = Column(String, ForeignKey("records.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_record_tags_record", "record_id"),
+    )
+
 
 class Profile(Base):
     __tablename__ = "profiles"
@@ -65,6 +93,7 @@ class Comment(Base):
     record_id = Column(String, ForeignKey("records.id", ondelete="CASCADE"), nullable=False, index=True)
     user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     content = Column(Text, nullable=False)
+    version = Column(Integer, nullable=False, default=0, server_default="0", index=True)  # 紀錄所屬 owner 的資料版本
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -82,3 +111,70 @@ class RefreshToken(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="refresh_tokens")
+
+
+class DataVersion(Base):
+    """各 owner 的資料版本：紀錄、留言、個人資料寫入時於同一交易內遞增"""
+    __tablename__ = "data_versions"
+
+    owner_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class Tombstone(Base):
+    """刪除紀錄／留言時留下的墓碑，供增量同步告知用戶端移除"""
+    __tablename__ = "tombstones"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    owner_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    entity = Column(String, nullable=False)        # "record" / "comment"
+    entity_id = Column(String, nullable=False)
+    version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_tombstones_owner_version", "owner_id", "version"),
+    )
+
+
+class LLMSummaryCache(Base):
+    """LLM 摘要快取：key 為 (system prompt, model, 參數, 內容) 的 SHA-256"""
+    __tablename__ = "llm_summary_cache"
+
+    key = Column(String(64), primary_key=True)
+    model = Column(String, nullable=False)
+    summary = Column(Text, nullable=False)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    last_used_at = Column(DateTime(timezone=True), nullable=False, index=True)  # LRU 淘汰依據
+
+
+# ===== 彙總資料表：於紀錄寫入時增量維護，可用 rebuild_summaries.py 重建 =====
+
+class RecordSummary(Base):
+    __tablename__ = "record_summaries"
+
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    record_count = Column(Integer, nullable=False, default=0)
+    total_hours = Column(Float, nullable=False, default=0.0)
+    first_date = Column(String, nullable=True)     # "YYYY-MM-DD"
+    last_date = Column(String, nullable=True)      # "YYYY-MM-DD"
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class SummaryTag(Base):
+    __tablename__ = "summary_tags"
+
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class SummaryWeek(Base):
+    __tablename__ = "summary_weeks"
+
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    week_start = Column(String, primary_key=True)  # 該週週一 "YYYY-MM-DD"
+    record_count = Column(Integer, nullable=False, default=0)
+    total_hours = Column(Float, nullable=False, default=0.0)
@@ -0,0 +1,55 @@
+"""
+Owner 解析
+viewer 可瀏覽所有 owner 的資料；owner 清單很少變動，因此快取在行程內並於註冊／角色變更時失效
+"""
+import os
+
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from models import User, Record
+
+OWNER_CACHE_TTL_SECONDS = int(os.getenv("OWNER_CACHE_TTL_SECONDS", "300"))
+
+_OWNER_KEY = "owner_ids"
+owner_cache = TTLCache(OWNER_CACHE_TTL_SECONDS, max_size=1)
+
+
+def get_owner_ids(db: Session) -> tuple:
+    """回傳所有 owner 的 id（依建立時間排序）"""
+    owner_ids = owner_cache.get(_OWNER_KEY)
+    if owner_ids is None:
+        rows = db.query(User.id).filter(User.role == 'owner').order_by(User.created_at.asc()).all()
+        owner_ids = tuple(row[0] for row in rows)
+        owner_cache.set(_OWNER_KEY, owner_ids)
+    return owner_ids
+
+
+def get_primary_owner_id(db: Session):
+    """viewer 看個人資料時使用的 owner（最早建立者），沒有 owner 時回傳 None"""
+    owner_ids = get_owner_ids(db)
+    return owner_ids[0] if owner_ids else None
+
+
+def invalidate_owner_ids() -> None:
+    """有用戶註冊為 owner 或角色變更時呼叫"""
+    owner_cache.clear()
+
+
+def visible_owner_ids(db: Session, current_user) -> tuple:
+    """目前用戶可見資料所屬的 owner：owner 為自己，viewer 為所有 owner"""
+    if current_user.role == 'viewer':
+        return get_owner_ids(db)
+    return (current_user.id,)
+
+
+def visible_records_query(db: Session, current_user):
+    """目前用戶可見紀錄的查詢：owner 只看自己的，viewer 看所有 owner 的紀錄
+
+    以快取的 owner id 篩選 user_id（單一 owner 時用等號），不 JOIN users，
+    時間軸排序與 keyset seek 才能直接走 (user_id, date, created_at, id) 索引。
+    """
+    owner_ids = visible_owner_ids(db, current_user)
+    if len(owner_ids) == 1:
+        return db.query(Record).filter(Record.user_id == owner_ids[0])
+    return db.query(Record).filter(Record.user_id.in_(owner_ids))
@@ -0,0 +1,177 @@
+"""
+紀錄的背景預先摘要
+create_record / update_record commit 後將紀錄 id 放入行程內佇列，由 lifespan 啟動的 worker
+非同步產生摘要，連同內容雜湊寫入 Record.feedback / summary_hash；
+雜湊與目前內容相同時略過，匯出週報時直接讀取預先產生的摘要。
+上游呼叫使用自己的名額（PRESUMMARIZE_CONCURRENCY），不與互動的 /api/llm/summarize 搶 LLM_CONCURRENCY；
+上線前既有的紀錄以 backfill_summaries.py 補齊
+"""
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from database import SessionLocal
+from models import Record
+import llm_cache
+from routers import llm
+
+PRESUMMARIZE_ENABLED = os.getenv("PRESUMMARIZE_ENABLED", "true").lower() in ("1", "true", "yes")
+PRESUMMARIZE_QUEUE_SIZE = int(os.getenv("PRESUMMARIZE_QUEUE_SIZE", "1000"))
+PRESUMMARIZE_CONCURRENCY = max(1, int(os.getenv("PRESUMMARIZE_CONCURRENCY", "1")))
+
+logger = logging.getLogger(__name__)
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_queue: Optional[asyncio.Queue] = None
+_pending = set()   # 已在佇列中的紀錄 id，重複寫入只排一次
+_workers: list = []
+_upstream_limit: Optional[asyncio.Semaphore] = None
+stats = {"processed": 0, "skipped": 0, "failed": 0, "dropped": 0}
+
+
+def start_worker() -> bool:
+    """於 lifespan 內呼叫；未設定 OpenAI API Key 或已停用時不啟動"""
+    global _loop, _queue, _upstream_limit
+    if not PRESUMMARIZE_ENABLED or not llm.OPENAI_API_KEY:
+        return False
+    _loop = asyncio.get_running_loop()
+    _queue = asyncio.Queue(maxsize=PRESUMMARIZE_QUEUE_SIZE)
+    _upstream_limit = asyncio.Semaphore(PRESUMMARIZE_CONCURRENCY)
+    _workers[:] = [
+        _loop.create_task(_run(), name=f"presummarize-{i}") for i in range(PRESUMMARIZE_CONCURRENCY)
+    ]
+    return True
+
+
+async def stop_worker() -> None:
+    global _loop, _queue, _upstream_limit
+    for worker in _workers:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _loop = _queue = _upstream_limit = None
+    _pending.clear()
+
+
+def upstream_limit() -> asyncio.Semaphore:
+    """背景摘要專用的上游名額；未經 start_worker（如 backfill 工具）時延遲建立"""
+    global _upstream_limit
+    if _upstream_limit is None:
+        _upstream_limit = asyncio.Semaphore(PRESUMMARIZE_CONCURRENCY)
+    return _upstream_limit
+
+
+def enqueue(record_id: str) -> None:
+    """排入預先摘要；可在同步端點（threadpool）中呼叫，worker 未啟動時不做事"""
+    loop = _loop
+    if loop is None or loop.is_closed():
+        return
+    loop.call_soon_threadsafe(_put, record_id)
+
+
+def _put(record_id: str) -> None:
+    if _queue is None or record_id in _pending:
+        return
+    try:
+        _queue.put_nowait(record_id)
+    except asyncio.QueueFull:
+        stats["dropped"] += 1
+        return
+    _pending.add(record_id)
+
+
+def queue_depth() -> int:
+    return _queue.qsize() if _queue is not None else 0
+
+
+def _load(record_id: str):
+    """回傳 (內容, 內容雜湊, 目前的 summary_hash)；紀錄已刪除時回傳 None"""
+    db = SessionLocal()
+    try:
+        row = db.query(Record.content, Record.summary_hash).filter(Record.id == record_id).first()
+        if row is None:
+            return None
+        return row.content, llm.summary_cache_key(row.content), row.summary_hash
+    finally:
+        db.close()
+
+
+def _save(record_id: str, key: str, summary: str, from_upstream: bool) -> bool:
+    """內容在摘要期間未被修改才寫入，回傳是否寫入；不變更 updated_at
+
+    只有剛向上游取得的摘要才寫入快取；來自快取的摘要若再寫一次會重設 hit_count 與 created_at，等於延長 TTL。
+    """
+    db = SessionLocal()
+    try:
+        row = db.query(Record.content).filter(Record.id == record_id).first()
+        if row is None or llm.summary_cache_key(row.content) != key:
+            return False
+        db.query(Record).filter(Record.id == record_id).update({
+            Record.feedback: summary,
+            Record.summary_hash: key,
+            Record.updated_at: Record.updated_at,
+        }, synchronize_session=False)
+        db.commit()
+        if from_upstream:
+            llm_cache.store_summary(db, key, llm.MODEL, summary)
+        return True
+    finally:
+        db.close()
+
+
+def _cached(key: str) -> Optional[str]:
+    db = SessionLocal()
+    try:
+        return llm_cache.get_cached_summary(db, key)
+    finally:
+        db.close()
+
+
+async def summarize_record(record_id: str) -> str:
+    """處理單筆紀錄，回傳 processed / skipped；資料庫存取在 threadpool 執行，不阻塞 event loop"""
+    loaded = await asyncio.to_thread(_load, record_id)
+    if loaded is None:
+        return "skipped"
+    content, key, summary_hash = loaded
+    if summary_hash == key or not (content or "").strip():
+        return "skipped"
+
+    summary = await asyncio.to_thread(_cached, key)
+    from_upstream = summary is None
+    if from_upstream:
+        summary = await llm._summarize_upstream(content, semaphore=upstream_limit())
+
+    saved = await asyncio.to_thread(_save, record_id, key, summary, from_upstream)
+    return "processed" if saved else "skipped"
+
+
+def stale_record_ids(user_id: Optional[str] = None) -> list:
+    """摘要缺少或與目前內容雜湊不符的紀錄 id（依日期遞減，最近的先補）"""
+    db = SessionLocal()
+    try:
+        query = db.query(Record.id, Record.content, Record.summary_hash)
+        if user_id:
+            query = query.filter(Record.user_id == user_id)
+        return [
+            record_id
+            for record_id, content, summary_hash in query.order_by(Record.date.desc()).yield_per(1000)
+            if (content or "").strip() and summary_hash != llm.summary_cache_key(content)
+        ]
+    finally:
+        db.close()
+
+
+async def _run() -> None:
+    while True:
+        record_id = await _queue.get()
+        _pending.discard(record_id)
+        try:
+            stats[await summarize_record(record_id)] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            stats["failed"] += 1
+            logger.exception("預先摘要失敗：%s", record_id)
+        finally:
+            _queue.task_done()
@@ -1,117 +1,312 @@
 """
 FastAPI Performance Profiling Middleware
-追蹤每個 API 端點的執行時間、記憶體使用
+追蹤每個 API 端點的執行時間
+
+純 ASGI middleware：以 perf_counter_ns 計時，日誌先放入記憶體佇列，
+再由背景執行緒批次寫檔，請求路徑上不做任何檔案 I/O。
 """
-import time
-import psutil
-import logging
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from datetime import datetime
+import atexit
 import json
+import math
 import os
-
-# 設定 profiling 日誌
-profiling_logger = logging.getLogger("profiling")
-profiling_logger.setLevel(logging.INFO)
+import queue
+import random
+import threading
+import time
+from datetime import datetime
 
 # 創建日誌目錄
 log_dir = os.path.join(os.path.dirname(__file__), "profiling_logs")
 os.makedirs(log_dir, exist_ok=True)
 
-# 日誌文件
-log_file = os.path.join(log_dir, f"api_profiling_{datetime.now().strftime('%Y%m%d')}.jsonl")
-file_handler = logging.FileHandler(log_file)
-file_handler.setFormatter(logging.Formatter('%(message)s'))
-profiling_logger.addHandler(file_handler)
+# 取樣與路徑規則（可由環境變數或建構參數覆寫）
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "1.0"))
+PROFILING_INCLUDE = os.getenv("PROFILING_INCLUDE", "")   # 逗號分隔的路徑前綴，空白表示全部
+PROFILING_EXCLUDE = os.getenv("PROFILING_EXCLUDE", "")   # 逗號分隔的路徑前綴
+PROFILING_FLUSH_INTERVAL = float(os.getenv("PROFILING_FLUSH_INTERVAL", "1.0"))
+PROFILING_QUEUE_SIZE = int(os.getenv("PROFILING_QUEUE_SIZE", "10000"))
 
-# 統計數據
+# 統計數據：(method, 路由樣板) -> 計數與延遲直方圖
 stats = {}
+_stats_lock = threading.Lock()
 
+PERCENTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p999", 0.999))
+_KNOWN_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"}
 
-class ProfilingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # 開始時間
-        start_time = time.time()
 
-        # 記錄開始時的記憶體
-        process = psutil.Process()
-        memory_before = process.memory_info().rss / 1024 / 1024  # MB
+class LatencyHistogram:
+    """固定記憶體的對數分桶直方圖（毫秒）
 
-        # 處理請求
-        response = await call_next(request)
+    每個 2 倍區間切成 SUB_BUCKETS 桶，相對誤差約 4%；
+    涵蓋 MIN_MS 到 MAX_MS，超出範圍的值歸入頭尾兩桶。
+    """
+    SUB_BUCKETS = 8
+    MIN_MS = 0.01
+    MAX_MS = 120_000.0
+    BUCKET_COUNT = int(math.ceil(math.log2(MAX_MS / MIN_MS) * SUB_BUCKETS)) + 1
 
-        # 計算執行時間
-        duration = (time.time() - start_time) * 1000  # 毫秒
+    __slots__ = ("counts", "count", "total", "min", "max")
 
-        # 記錄結束時的記憶體
-        memory_after = process.memory_info().rss / 1024 / 1024  # MB
-        memory_delta = memory_after - memory_before
+    def __init__(self):
+        self.counts = [0] * self.BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
 
-        # 記錄資料
-        endpoint = f"{request.method} {request.url.path}"
+    @classmethod
+    def _index(cls, value: float) -> int:
+        if value <= cls.MIN_MS:
+            return 0
+        idx = int(math.log2(value / cls.MIN_MS) * cls.SUB_BUCKETS) + 1
+        return min(idx, cls.BUCKET_COUNT - 1)
 
-        profiling_data = {
-            "timestamp": datetime.now().isoformat(),
-            "endpoint": endpoint,
-            "method": request.method,
-            "path": request.url.path,
-            "duration_ms": round(duration, 2),
-            "status_code": response.status_code,
-            "memory_before_mb": round(memory_before, 2),
-            "memory_after_mb": round(memory_after, 2),
-            "memory_delta_mb": round(memory_delta, 2),
-        }
+    @classmethod
+    def _upper_bound(cls, idx: int) -> float:
+        return cls.MIN_MS * 2 ** (idx / cls.SUB_BUCKETS)
+
+    def record(self, value: float) -> None:
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        """回傳第 q 分位（0~1）所在分桶的上界，並夾在實際 min/max 之間"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for idx, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return max(self.min, min(self._upper_bound(idx), self.max))
+        return self.max
+
+    def copy(self) -> "LatencyHistogram":
+        other = LatencyHistogram()
+        other.counts = list(self.counts)
+        other.count, other.total, other.min, other.max = self.count, self.total, self.min, self.max
+        return other
+
+
+def current_log_file() -> str:
+    """當日的日誌檔案（跨日自動換檔）"""
+    return os.path.join(log_dir, f"api_profiling_{datetime.now().strftime('%Y%m%d')}.jsonl")
+
+
+def _split_prefixes(value) -> tuple:
+    if not value:
+        return ()
+    if isinstance(value, str):
+        value = value.split(",")
+    return tuple(p.strip() for p in value if p.strip())
+
+
+class ProfilingLogWriter:
+    """背景寫檔執行緒：定期將佇列中的日誌批次寫入當日 JSONL 檔案"""
+
+    def __init__(self, flush_interval: float = PROFILING_FLUSH_INTERVAL, max_queue: int = PROFILING_QUEUE_SIZE):
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="profiling-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, entry: dict) -> None:
+        """放入佇列；佇列已滿時丟棄並計數，絕不阻塞請求"""
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> int:
+        """將佇列中所有日誌寫入檔案，回傳寫入筆數"""
+        lines = []
+        while True:
+            try:
+                lines.append(json.dumps(self._queue.get_nowait(), ensure_ascii=False))
+            except queue.Empty:
+                break
+        if lines:
+            with open(current_log_file(), "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        return len(lines)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
 
-        # 寫入日誌
-        profiling_logger.info(json.dumps(profiling_data, ensure_ascii=False))
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError:
+                pass  # 寫檔失敗時保留後續日誌，不影響服務
 
-        # 更新統計
-        if endpoint not in stats:
-            stats[endpoint] = {
-                "count": 0,
-                "total_duration": 0,
-                "min_duration": float('inf'),
-                "max_duration": 0,
-                "total_memory_delta": 0,
-            }
 
-        stats[endpoint]["count"] += 1
-        stats[endpoint]["total_duration"] += duration
-        stats[endpoint]["min_duration"] = min(stats[endpoint]["min_duration"], duration)
-        stats[endpoint]["max_duration"] = max(stats[endpoint]["max_duration"], duration)
-        stats[endpoint]["total_memory_delta"] += memory_delta
+log_writer = ProfilingLogWriter()
+atexit.register(log_writer.stop)
 
-        # 添加 header（供前端查看）
-        response.headers["X-Process-Time"] = str(round(duration, 2))
-        response.headers["X-Memory-Delta"] = str(round(memory_delta, 2))
 
-        return response
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app,
+        sample_rate: float = None,
+        include_paths=None,
+        exclude_paths=None,
+    ):
+        self.app = app
+        self.sample_rate = PROFILING_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.include_paths = _split_prefixes(PROFILING_INCLUDE if include_paths is None else include_paths)
+        self.exclude_paths = _split_prefixes(PROFILING_EXCLUDE if exclude_paths is None else exclude_paths)
+        log_writer.start()
+
+    def _should_profile(self, path: str) -> bool:
+        if self.include_paths and not path.startswith(self.include_paths):
+            return False
+        if self.exclude_paths and path.startswith(self.exclude_paths):
+            return False
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        start_ns = time.perf_counter_ns()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # 添加 header（供前端查看）：到送出 header 為止的處理時間
+                elapsed_ms = (time.perf_counter_ns() - start_ns) / 1_000_000
+                headers = list(message.get("headers", []))
+                headers.append((b"x-process-time", str(round(elapsed_ms, 2)).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = (time.perf_counter_ns() - start_ns) / 1_000_000  # 毫秒
+            method = scope["method"]
+            path = scope["path"]
+            route = route_template(scope)
+            endpoint = f"{method} {path}"
+            _record_stats(method, route, status_code, duration)
+
+            if self.sample_rate >= 1.0 or random.random() < self.sample_rate:
+                log_writer.submit({
+                    "timestamp": datetime.now().isoformat(),
+                    "endpoint": endpoint,
+                    "route": route,
+                    "method": method,
+                    "path": path,
+                    "duration_ms": round(duration, 2),
+                    "status_code": status_code,
+                })
+
+
+def route_template(scope) -> str:
+    """路由樣板（如 /api/records/{record_id}），避免每個 id 都成為獨立端點；
+    靜態檔案與未匹配的路徑統一歸為 <other>"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<other>"
+
+
+def _record_stats(method: str, route: str, status_code: int, duration: float) -> None:
+    if method not in _KNOWN_METHODS:
+        method = "OTHER"
+    key = (method, route)
+    with _stats_lock:
+        data = stats.get(key)
+        if data is None:
+            data = stats[key] = {"histogram": LatencyHistogram(), "status": {}}
+        data["histogram"].record(duration)
+        data["status"][status_code] = data["status"].get(status_code, 0) + 1
+
+
+def snapshot_stats() -> list:
+    """複製目前的統計（method, route, histogram, status 計數），供報表與 /metrics 使用"""
+    with _stats_lock:
+        return [
+            (method, route, data["histogram"].copy(), dict(data["status"]))
+            for (method, route), data in stats.items()
+        ]
 
 
 def get_profiling_stats():
     """取得 profiling 統計資訊"""
     result = []
-    for endpoint, data in stats.items():
-        avg_duration = data["total_duration"] / data["count"]
-        avg_memory = data["total_memory_delta"] / data["count"]
-
-        result.append({
-            "endpoint": endpoint,
-            "count": data["count"],
-            "avg_duration_ms": round(avg_duration, 2),
-            "min_duration_ms": round(data["min_duration"], 2),
-            "max_duration_ms": round(data["max_duration"], 2),
-            "avg_memory_delta_mb": round(avg_memory, 4),
-        })
+    for method, route, hist, status_counts in snapshot_stats():
+        item = {
+            "endpoint": f"{method} {route}",
+            "count": hist.count,
+            "avg_duration_ms": round(hist.total / hist.count, 2),
+            "min_duration_ms": round(hist.min, 2),
+            "max_duration_ms": round(hist.max, 2),
+            "status_counts": status_counts,
+        }
+        for label, q in PERCENTILES:
+            item[f"{label}_ms"] = round(hist.percentile(q), 2)
+        result.append(item)
 
     # 按平均執行時間排序
     result.sort(key=lambda x: x["avg_duration_ms"], reverse=True)
     return result
 
 
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus() -> str:
+    """以 Prometheus text format 輸出各路由的延遲分位數與請求數"""
+    lines = [
+        "# HELP mysite_http_request_duration_ms HTTP request latency in milliseconds.",
+        "# TYPE mysite_http_request_duration_ms summary",
+    ]
+    snapshot = snapshot_stats()
+    for method, route, hist, _ in snapshot:
+        labels = f'method="{method}",route="{_escape_label(route)}"'
+        for _, q in PERCENTILES:
+            lines.append(f'mysite_http_request_duration_ms{{{labels},quantile="{q}"}} {hist.percentile(q):.3f}')
+        lines.append(f"mysite_http_request_duration_ms_sum{{{labels}}} {hist.total:.3f}")
+        lines.append(f"mysite_http_request_duration_ms_count{{{labels}}} {hist.count}")
+
+    lines.append("# HELP mysite_http_requests_total HTTP requests by route and status code.")
+    lines.append("# TYPE mysite_http_requests_total counter")
+    for method, route, _, status_counts in snapshot:
+        for status_code, n in sorted(status_counts.items()):
+            lines.append(
+                f'mysite_http_requests_total{{method="{method}",route="{_escape_label(route)}",status="{status_code}"}} {n}'
+            )
+
+    lines.append("# HELP mysite_profiling_log_dropped_total Profiling log entries dropped because the queue was full.")
+    lines.append("# TYPE mysite_profiling_log_dropped_total counter")
+    lines.append(f"mysite_profiling_log_dropped_total {log_writer.dropped}")
+    return "\n".join(lines) + "\n"
+
+
 def print_profiling_report():
     """列印 profiling 報告"""
+    log_writer.flush()
+
     print("\n" + "="*80)
     print("📊 API Performance Profiling Report")
     print("="*80)
@@ -122,17 +317,19 @@ def print_profiling_report():
         print("尚無 profiling 資料")
         return
 
-    print(f"\n{'Endpoint':<40} {'Count':>8} {'Avg (ms)':>10} {'Min (ms)':>10} {'Max (ms)':>10} {'Mem (MB)':>10}")
+    print(f"\n{'Endpoint':<40} {'Count':>8} {'Avg (ms)':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'Max (ms)':>10}")
     print("-"*80)
 
     for item in report:
         print(f"{item['endpoint']:<40} "
               f"{item['count']:>8} "
               f"{item['avg_duration_ms']:>10.2f} "
-              f"{item['min_duration_ms']:>10.2f} "
-              f"{item['max_duration_ms']:>10.2f} "
-              f"{item['avg_memory_delta_mb']:>10.4f}")
+              f"{item['p50_ms']:>10.2f} "
+              f"{item['p99_ms']:>10.2f} "
+              f"{item['max_duration_ms']:>10.2f}")
 
     print("="*80)
-    print(f"日誌檔案：{log_file}")
+    print(f"日誌檔案：{current_log_file()}")
+    if log_writer.dropped:
+        print(f"佇列滿載而丟棄的日誌：{log_writer.dropped} 筆")
     print("="*80 + "\n")
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+紀錄彙總重建工具
+彙總表平時於紀錄寫入時增量維護；直接修改資料庫或懷疑數字不一致時，用此工具從 records 重新計算
+
+用法：
+    python rebuild_summaries.py                 # 重建所有用戶
+    python rebuild_summaries.py owner@example.com
+    python rebuild_summaries.py --check         # 只檢查（含逐筆重算總時數），不一致時以非零結束
+"""
+import sys
+
+from database import SessionLocal, engine, Base
+from models import User
+from summaries import is_consistent, rebuild
+
+
+def main() -> int:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if sys.argv[1:] == ["--check"]:
+            if is_consistent(db, check_hours=True):
+                print("[OK] 彙總與紀錄一致")
+                return 0
+            print("[X] 彙總與紀錄不一致，請執行 python rebuild_summaries.py 重建")
+            return 1
+
+        user_id = None
+        if len(sys.argv) > 1:
+            user = db.query(User).filter(User.email == sys.argv[1]).first()
+            if not user:
+                print(f"[X] 找不到用戶：{sys.argv[1]}")
+                return 1
+            user_id = user.id
+
+        count = rebuild(db, user_id)
+        db.commit()
+        print(f"[OK] 已重建彙總，共 {count} 筆紀錄")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, Cookie, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
 from typing import Optional
@@ -8,20 +9,68 @@ from database import get_db
 from models import User, RefreshToken
 from schemas import RegisterRequest, LoginRequest, TokenResponse, UserResponse
 from auth import (
-    hash_password, verify_password, get_current_user,
+    hash_password_async, verify_password_async, needs_rehash, get_current_user,
     create_access_token, create_refresh_token_value, get_refresh_token_expiry,
     REFRESH_TOKEN_EXPIRES_DAYS
 )
+from owners import invalidate_owner_ids
 
 OWNER_EMAIL = os.getenv("OWNER_EMAIL", "")
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
+def _email_registered(db: Session, email: str) -> bool:
+    exists = db.query(User.id).filter(User.email == email).first() is not None
+    # 結束唯讀交易以歸還連線，等待 bcrypt 期間不佔用連線池
+    db.rollback()
+    return exists
+
+
+def _create_user(db: Session, email: str, password_hash: str, role: str) -> None:
+    user = User(email=email, password_hash=password_hash, role=role)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+
+    # 建立預設個人資料
+    from models import Profile
+    profile = Profile(user_id=user.id)
+    db.add(profile)
+    db.commit()
+
+
+def _find_user(db: Session, email: str):
+    user = db.query(User.id, User.email, User.password_hash).filter(User.email == email).first()
+    # 結束唯讀交易以歸還連線，等待 bcrypt 期間不佔用連線池
+    db.rollback()
+    return user
+
+
+def _issue_refresh_token(db: Session, user_id: str, new_password_hash: Optional[str]) -> str:
+    """寫入 Refresh Token（與需要時的重新雜湊）並提交，回傳 token 值"""
+    if new_password_hash:
+        db.query(User).filter(User.id == user_id).update(
+            {User.password_hash: new_password_hash}, synchronize_session=False
+        )
+
+    refresh_token_value = create_refresh_token_value()
+    refresh_token = RefreshToken(
+        token=refresh_token_value,
+        user_id=user_id,
+        expires_at=get_refresh_token_expiry()
+    )
+    db.add(refresh_token)
+    db.commit()
+    return refresh_token_value
+
+
+# register / login 為 async 端點：bcrypt 在專用執行緒池上 await，
+# 資料庫存取以 run_in_threadpool 執行，等待雜湊時不佔用 FastAPI threadpool
 @router.post("/register", status_code=201)
-def register(req: RegisterRequest, db: Session = Depends(get_db)):
+async def register(req: RegisterRequest, db: Session = Depends(get_db)):
     # 檢查 Email 是否已存在
-    if db.query(User).filter(User.email == req.email).first():
+    if await run_in_threadpool(_email_registered, db, req.email):
         raise HTTPException(status_code=400, detail="此 Email 已被註冊")
 
     # 密碼長度驗證
@@ -31,43 +80,32 @@ def register(req: RegisterRequest, db: Session = Depends(get_db)):
     # 只有 OWNER_EMAIL 才是 owner，其餘都是 viewer
     role = 'owner' if OWNER_EMAIL and req.email.lower() == OWNER_EMAIL.lower() else 'viewer'
 
-    user = User(
-        email=req.email,
-        password_hash=hash_password(req.password),
-        role=role,
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    password_hash = await hash_password_async(req.password)
+    await run_in_threadpool(_create_user, db, req.email, password_hash, role)
 
-    # 建立預設個人資料
-    from models import Profile
-    profile = Profile(user_id=user.id)
-    db.add(profile)
-    db.commit()
+    if role == 'owner':
+        invalidate_owner_ids()
 
     return {"message": "註冊成功，請登入"}
 
 
 @router.post("/login")
-def login(req: LoginRequest, response: Response, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == req.email).first()
+async def login(req: LoginRequest, response: Response, db: Session = Depends(get_db)):
+    user = await run_in_threadpool(_find_user, db, req.email)
 
-    if not user or not verify_password(req.password, user.password_hash):
+    if not user or not await verify_password_async(req.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Email 或密碼錯誤")
 
+    # cost factor 設定變更後，於登入成功時以新設定重新雜湊
+    new_password_hash = None
+    if needs_rehash(user.password_hash):
+        new_password_hash = await hash_password_async(req.password)
+
     # 建立 Access Token
     access_token = create_access_token(user.id)
 
     # 建立 Refresh Token 並存入資料庫
-    refresh_token_value = create_refresh_token_value()
-    refresh_token = RefreshToken(
-        token=refresh_token_value,
-        user_id=user.id,
-        expires_at=get_refresh_token_expiry()
-    )
-    db.add(refresh_token)
-    db.commit()
+    refresh_token_value = await run_in_threadpool(_issue_refresh_token, db, user.id, new_password_hash)
 
     # 設定 httpOnly Cookie
     response.set_cookie(
@@ -1,35 +1,80 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session, joinedload
 
 from database import get_db
 from models import User, Record, Comment
+from schemas import CommentBatchRequest
 from auth import get_current_user
+from owners import visible_records_query
+from etag import etag_guard
+import fast_json
+from versions import add_tombstone, bump_version, record_owner_id
 
 router = APIRouter(tags=["comments"])
 
+BATCH_MAX_RECORD_IDS = 500
 
-def comment_to_dict(c: Comment) -> dict:
+
+def comment_to_dict(c: Comment, *, user_email: str = None) -> dict:
+    """已知作者 email 時由呼叫端傳入，否則讀取 c.user（列表查詢須先 joinedload 避免 N+1）
+
+    與 record_to_dict 相同，createdAt / updatedAt 為 datetime，須經 fast_json 或 jsonable_encoder 序列化。
+    """
+    if user_email is None:
+        user_email = c.user.email if c.user else ""
     return {
         "id": c.id,
         "record_id": c.record_id,
         "user_id": c.user_id,
-        "user_email": c.user.email if c.user else "",
+        "user_email": user_email,
         "content": c.content,
-        "createdAt": c.created_at.isoformat() if c.created_at else None,
-        "updatedAt": c.updated_at.isoformat() if c.updated_at else None,
+        "createdAt": c.created_at,
+        "updatedAt": c.updated_at,
     }
 
 
-@router.get("/api/records/{record_id}/comments")
+@router.get("/api/records/{record_id}/comments", dependencies=[Depends(etag_guard)])
 def get_comments(
     record_id: str,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    comments = db.query(Comment).filter(
+    comments = db.query(Comment).options(joinedload(Comment.user)).filter(
         Comment.record_id == record_id
     ).order_by(Comment.created_at.asc()).all()
-    return {"comments": [comment_to_dict(c) for c in comments]}
+    return fast_json.json_response({"comments": [comment_to_dict(c) for c in comments]}, response)
+
+
+@router.post("/api/comments/batch")
+def get_comments_batch(
+    req: CommentBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """一次取得多筆紀錄的留言（依 record_ids 或日期區間），回傳 {record_id: [留言]}"""
+    if not req.record_ids and not (req.date_from or req.date_to):
+        raise HTTPException(status_code=400, detail="請提供 record_ids 或日期區間")
+    if req.record_ids and len(req.record_ids) > BATCH_MAX_RECORD_IDS:
+        raise HTTPException(status_code=400, detail=f"record_ids 最多 {BATCH_MAX_RECORD_IDS} 筆")
+
+    records = visible_records_query(db, current_user)
+    if req.record_ids:
+        records = records.filter(Record.id.in_(req.record_ids))
+    if req.date_from:
+        records = records.filter(Record.date >= req.date_from)
+    if req.date_to:
+        records = records.filter(Record.date <= req.date_to)
+    record_ids = records.with_entities(Record.id).subquery()
+
+    comments = db.query(Comment).options(joinedload(Comment.user)).filter(
+        Comment.record_id.in_(record_ids.select())
+    ).order_by(Comment.record_id, Comment.created_at.asc()).all()
+
+    grouped = {rid: [] for rid in (req.record_ids or [])}
+    for c in comments:
+        grouped.setdefault(c.record_id, []).append(comment_to_dict(c))
+    return fast_json.json_response({"comments": grouped})
 
 
 @router.post("/api/records/{record_id}/comments", status_code=201)
@@ -48,10 +93,11 @@ def add_comment(
         user_id=current_user.id,
         content=content,
     )
+    comment.version = bump_version(db, record_owner_id(db, record_id)) or 0
     db.add(comment)
     db.commit()
     db.refresh(comment)
-    return {"comment": comment_to_dict(comment)}
+    return {"comment": comment_to_dict(comment, user_email=current_user.email)}
 
 
 @router.put("/api/comments/{comment_id}")
@@ -72,9 +118,10 @@ def update_comment(
         raise HTTPException(status_code=400, detail="留言內容不可為空")
 
     comment.content = content
+    comment.version = bump_version(db, record_owner_id(db, comment.record_id)) or 0
     db.commit()
     db.refresh(comment)
-    return {"comment": comment_to_dict(comment)}
+    return {"comment": comment_to_dict(comment, user_email=current_user.email)}
 
 
 @router.delete("/api/comments/{comment_id}")
@@ -89,6 +136,7 @@ def delete_comment(
     if comment.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="只能刪除自己的留言")
 
+    add_tombstone(db, record_owner_id(db, comment.record_id), "comment", comment.id)
     db.delete(comment)
     db.commit()
     return {"success": True}
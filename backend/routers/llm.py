@@ -1,11 +1,20 @@
+import asyncio
+import json
+import random
 import httpx
 import os
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
+from sqlalchemy.orm import Session
 
+from database import get_db, SessionLocal
 from models import User
-from schemas import SummarizeRequest, SummarizeResponse
+from schemas import SummarizeRequest, SummarizeResponse, SummarizeBatchRequest
 from auth import get_current_user
+import llm_cache
+from http_client import get_client
 
 load_dotenv()
 
@@ -13,6 +22,19 @@ router = APIRouter(prefix="/api/llm", tags=["llm"])
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_URL = "https://api.openai.com/v1/chat/completions"
+MODEL = "gpt-4o-mini"
+MAX_TOKENS = 200
+TEMPERATURE = 0.7
+
+# 上游併發與重試：所有請求共用同一個 semaphore，避免匯出週報時瞬間打出大量請求而遭 429
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = 30.0
+LLM_BATCH_MAX_ITEMS = 100
+
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+_upstream_semaphore: Optional[asyncio.Semaphore] = None
 
 SYSTEM_PROMPT = """你是一個實習紀錄摘要助手。根據使用者提供的實習日誌內容，提取出具體的實作行動。
 
@@ -23,42 +45,262 @@ SYSTEM_PROMPT = """你是一個實習紀錄摘要助手。根據使用者提供
 - 濃縮為 1~3 點，每點嚴格不超過 30 字"""
 
 
+def start_upstream_limit() -> None:
+    """於 lifespan 內呼叫，讓 semaphore 建立在 app 的 event loop 上"""
+    global _upstream_semaphore
+    _upstream_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+
+
+def stop_upstream_limit() -> None:
+    global _upstream_semaphore
+    _upstream_semaphore = None
+
+
+def upstream_semaphore() -> asyncio.Semaphore:
+    """未經 lifespan（例如測試未進入 TestClient context）時於目前的 loop 延遲建立"""
+    if _upstream_semaphore is None:
+        start_upstream_limit()
+    return _upstream_semaphore
+
+
+def _summary_params() -> dict:
+    return {"max_tokens": MAX_TOKENS, "temperature": TEMPERATURE}
+
+
+def summary_cache_key(content: str) -> str:
+    """摘要快取與預先摘要共用的內容雜湊（prompt、模型或參數變更時自然失效）"""
+    return llm_cache.cache_key(SYSTEM_PROMPT, MODEL, _summary_params(), content)
+
+
+async def _request_summary(content: str) -> str:
+    response = await get_client().post(
+        OPENAI_URL,
+        headers={
+            "Authorization": f"Bearer {OPENAI_API_KEY}",
+            "Content-Type": "application/json"
+        },
+        json={
+            "model": MODEL,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": content}
+            ],
+            **_summary_params(),
+        }
+    )
+    response.raise_for_status()
+    data = response.json()
+    return data["choices"][0]["message"]["content"].strip()
+
+
+def _retry_delay(attempt: int, response: httpx.Response = None) -> float:
+    """優先採用 Retry-After，否則指數退避加上隨機抖動"""
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), LLM_RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    return min(LLM_RETRY_BASE_DELAY * 2 ** attempt * (0.5 + random.random()), LLM_RETRY_MAX_DELAY)
+
+
+async def _summarize_upstream(content: str, semaphore: Optional[asyncio.Semaphore] = None) -> str:
+    """在 semaphore（預設為互動請求共用的名額）下呼叫上游；429、5xx 與連線錯誤時退避重試（等待時不佔用名額）"""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        async with semaphore or upstream_semaphore():
+            try:
+                return await _request_summary(content)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in _RETRYABLE_STATUS or attempt == LLM_MAX_RETRIES:
+                    raise
+                delay = _retry_delay(attempt, e.response)
+            except httpx.TransportError:
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                delay = _retry_delay(attempt)
+        await asyncio.sleep(delay)
+
+
+def fallback_summary(content: str) -> str:
+    """摘要失敗時的替代內容：將原文每行轉為條列"""
+    return "\n".join(f"• {line.strip()}" for line in content.split("\n") if line.strip())
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"OpenAI API 錯誤：HTTP {error.response.status_code}"
+    return f"摘要生成失敗：{error}"
+
+
 @router.post("/summarize")
 async def summarize(
     req: SummarizeRequest,
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """代理 OpenAI API 呼叫，API Key 儲存在後端 .env"""
-    if not OPENAI_API_KEY:
-        raise HTTPException(status_code=500, detail="伺服器未設定 OpenAI API Key")
-
+    """代理 OpenAI API 呼叫，API Key 儲存在後端 .env；相同內容的摘要由資料庫快取回傳"""
     if not req.content or not req.content.strip():
         raise HTTPException(status_code=400, detail="內容不可為空")
 
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                OPENAI_URL,
-                headers={
-                    "Authorization": f"Bearer {OPENAI_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "gpt-4o-mini",
-                    "messages": [
-                        {"role": "system", "content": SYSTEM_PROMPT},
-                        {"role": "user", "content": req.content}
-                    ],
-                    "max_tokens": 200,
-                    "temperature": 0.7
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            summary = data["choices"][0]["message"]["content"].strip()
-            return {"summary": summary}
+    # 快取讀寫為同步的資料庫存取，移到執行緒，不阻塞 event loop
+    key = summary_cache_key(req.content)
+    cached = await asyncio.to_thread(llm_cache.get_cached_summary, db, key)
+    if cached is not None:
+        return {"summary": cached, "cached": True}
+
+    if not OPENAI_API_KEY:
+        raise HTTPException(status_code=500, detail="伺服器未設定 OpenAI API Key")
 
+    try:
+        summary = await _summarize_upstream(req.content)
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=502, detail=f"OpenAI API 錯誤：{e.response.text}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"摘要生成失敗：{str(e)}")
+
+    await asyncio.to_thread(llm_cache.store_summary, db, key, MODEL, summary)
+    return {"summary": summary, "cached": False}
+
+
+@router.post("/summarize/batch")
+async def summarize_batch(
+    req: SummarizeBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """批次摘要：相同內容只處理一次，先查快取，其餘在共用 semaphore 下併發呼叫上游
+
+    results 與 contents 順序一一對應；個別失敗時回傳 fallback 條列與 error，不影響其他項目。
+    """
+    if len(req.contents) > LLM_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"contents 最多 {LLM_BATCH_MAX_ITEMS} 筆")
+
+    unique = list(dict.fromkeys(c for c in req.contents if c and c.strip()))
+    keys = {content: summary_cache_key(content) for content in unique}
+    hits = await asyncio.to_thread(llm_cache.get_cached_summaries, db, keys.values())
+    results = {}
+    pending = []
+    for content, key in keys.items():
+        if key in hits:
+            results[content] = {"summary": hits[key], "cached": True, "fallback": False, "error": None}
+        else:
+            pending.append((content, key))
+
+    if pending and not OPENAI_API_KEY:
+        outcomes = [RuntimeError("伺服器未設定 OpenAI API Key")] * len(pending)
+    else:
+        outcomes = await asyncio.gather(
+            *(_summarize_upstream(content) for content, _ in pending), return_exceptions=True
+        )
+
+    fresh = {}
+    for (content, key), outcome in zip(pending, outcomes):
+        if isinstance(outcome, Exception):
+            results[content] = {
+                "summary": fallback_summary(content), "cached": False, "fallback": True,
+                "error": _error_message(outcome),
+            }
+        else:
+            fresh[key] = outcome
+            results[content] = {"summary": outcome, "cached": False, "fallback": False, "error": None}
+    await asyncio.to_thread(llm_cache.store_summaries, db, MODEL, fresh)
+
+    empty = {"summary": "", "cached": False, "fallback": False, "error": None}
+    return {
+        "results": [results.get(content, empty) for content in req.contents],
+        "unique": len(unique),
+        "upstream_calls": len(pending),
+    }
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _stream_upstream(content: str):
+    """逐段產生上游 stream 的文字（OpenAI chat completions 的 SSE 格式）"""
+    async with get_client().stream(
+        "POST",
+        OPENAI_URL,
+        headers={
+            "Authorization": f"Bearer {OPENAI_API_KEY}",
+            "Content-Type": "application/json"
+        },
+        json={
+            "model": MODEL,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": content}
+            ],
+            "stream": True,
+            **_summary_params(),
+        }
+    ) as response:
+        if response.is_error:
+            await response.aread()
+            response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            payload = line[len("data:"):].strip()
+            if payload == "[DONE]":
+                break
+            choices = json.loads(payload).get("choices") or []
+            delta = (choices[0].get("delta") or {}).get("content") if choices else None
+            if delta:
+                yield delta
+
+
+def _store_in_new_session(key: str, summary: str) -> None:
+    """依賴注入的 session 在串流開始前就已關閉，寫入快取另開 session（在執行緒中呼叫）"""
+    session = SessionLocal()
+    try:
+        llm_cache.store_summary(session, key, MODEL, summary)
+    finally:
+        session.close()
+
+
+@router.post("/summarize/stream")
+async def summarize_stream(
+    req: SummarizeRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """以 Server-Sent Events 串流摘要：每段文字為 delta 事件，完成時送出 done（含完整摘要）
+
+    上游回傳的 token 邊收邊送，不等待整份回應；用戶端斷線時 StreamingResponse 會取消產生器，
+    離開 client.stream 的 context 即關閉上游連線。快取命中時直接送出完整摘要。
+    """
+    if not req.content or not req.content.strip():
+        raise HTTPException(status_code=400, detail="內容不可為空")
+
+    key = summary_cache_key(req.content)
+    cached = await asyncio.to_thread(llm_cache.get_cached_summary, db, key)
+    if cached is None and not OPENAI_API_KEY:
+        raise HTTPException(status_code=500, detail="伺服器未設定 OpenAI API Key")
+
+    async def events():
+        if cached is not None:
+            yield _sse("delta", {"text": cached})
+            yield _sse("done", {"summary": cached, "cached": True})
+            return
+
+        parts = []
+        try:
+            async with upstream_semaphore():
+                async for delta in _stream_upstream(req.content):
+                    parts.append(delta)
+                    yield _sse("delta", {"text": delta})
+        except Exception as e:
+            yield _sse("error", {"detail": _error_message(e)})
+            return
+
+        summary = "".join(parts).strip()
+        await asyncio.to_thread(_store_in_new_session, key, summary)
+        yield _sse("done", {"summary": summary, "cached": False})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,70 @@
+import hmac
+import os
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+
+from database import get_db
+from auth import bearer_scheme, get_current_user, password_pool_stats, user_cache
+from profiling_middleware import render_prometheus
+from llm_cache import cache_stats as llm_cache_stats
+from http_client import pool_stats as http_pool_stats
+import presummarize
+
+router = APIRouter(tags=["metrics"])
+
+# Prometheus 等抓取端可使用固定 token；未設定時僅 owner 的 JWT 可存取
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+async def require_metrics_access(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    db: Session = Depends(get_db)
+):
+    if METRICS_TOKEN and hmac.compare_digest(credentials.credentials, METRICS_TOKEN):
+        return
+    user = await get_current_user(credentials, db)
+    if user.role != 'owner':
+        raise HTTPException(status_code=403, detail="無權限存取監控資料")
+
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_access)])
+def metrics():
+    """以 Prometheus text format 輸出延遲分位數與服務內部狀態（僅管理者）"""
+    pool = password_pool_stats()
+    cache = user_cache.stats()
+    llm = llm_cache_stats()
+    http_pool = http_pool_stats()
+    lines = [
+        render_prometheus().rstrip("\n"),
+        "# HELP mysite_password_pool_queue_depth Password hashing tasks queued or running.",
+        "# TYPE mysite_password_pool_queue_depth gauge",
+        f"mysite_password_pool_queue_depth {pool['queue_depth']}",
+        "# HELP mysite_user_cache_hits_total Authenticated user cache hits.",
+        "# TYPE mysite_user_cache_hits_total counter",
+        f"mysite_user_cache_hits_total {cache['hits']}",
+        "# HELP mysite_user_cache_misses_total Authenticated user cache misses.",
+        "# TYPE mysite_user_cache_misses_total counter",
+        f"mysite_user_cache_misses_total {cache['misses']}",
+        "# HELP mysite_llm_cache_hits_total LLM summary cache hits.",
+        "# TYPE mysite_llm_cache_hits_total counter",
+        f"mysite_llm_cache_hits_total {llm['hits']}",
+        "# HELP mysite_llm_cache_misses_total LLM summary cache misses.",
+        "# TYPE mysite_llm_cache_misses_total counter",
+        f"mysite_llm_cache_misses_total {llm['misses']}",
+        "# HELP mysite_http_client_connections Outbound HTTP client connections by state.",
+        "# TYPE mysite_http_client_connections gauge",
+        f'mysite_http_client_connections{{state="idle"}} {http_pool["idle_connections"]}',
+        f'mysite_http_client_connections{{state="active"}} {http_pool["connections"] - http_pool["idle_connections"]}',
+        "# HELP mysite_http_client_requests_in_flight Outbound requests in progress or waiting for a connection.",
+        "# TYPE mysite_http_client_requests_in_flight gauge",
+        f"mysite_http_client_requests_in_flight {http_pool['requests_in_flight']}",
+        "# HELP mysite_presummarize_queue_depth Records waiting for background summarization.",
+        "# TYPE mysite_presummarize_queue_depth gauge",
+        f"mysite_presummarize_queue_depth {presummarize.queue_depth()}",
+        "# HELP mysite_presummarize_jobs_total Background summarization jobs by result.",
+        "# TYPE mysite_presummarize_jobs_total counter",
+        *(f'mysite_presummarize_jobs_total{{result="{result}"}} {n}' for result, n in presummarize.stats.items()),
+    ]
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
@@ -5,6 +5,9 @@ from database import get_db
 from models import User, Profile
 from schemas import ProfileUpdate, ProfileResponse
 from auth import get_current_user
+from owners import get_primary_owner_id
+from etag import etag_guard
+from versions import bump_version
 
 router = APIRouter(prefix="/api/profile", tags=["profile"])
 
@@ -23,22 +26,23 @@ def profile_to_dict(p: Profile) -> dict:
     }
 
 
-@router.get("")
+@router.get("", dependencies=[Depends(etag_guard)])
 def get_profile(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """取得個人資料：owner 看自己的，viewer 看 owner 的"""
     if current_user.role == 'viewer':
-        owner = db.query(User).filter(User.role == 'owner').first()
-        if not owner:
+        owner_id = get_primary_owner_id(db)
+        if not owner_id:
             raise HTTPException(status_code=404, detail="找不到 owner 資料")
-        profile = db.query(Profile).filter(Profile.user_id == owner.id).first()
+        profile = db.query(Profile).filter(Profile.user_id == owner_id).first()
     else:
         profile = db.query(Profile).filter(Profile.user_id == current_user.id).first()
         if not profile:
             profile = Profile(user_id=current_user.id)
             db.add(profile)
+            bump_version(db, current_user.id)
             db.commit()
             db.refresh(profile)
 
@@ -75,6 +79,7 @@ def update_profile(
     if req.linkedin is not None:
         profile.linkedin = req.linkedin
 
+    bump_version(db, current_user.id)
     db.commit()
     db.refresh(profile)
 
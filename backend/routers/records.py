@@ -1,18 +1,34 @@
+import base64
 import json
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import Optional
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import String, and_, or_, tuple_, type_coerce
+from sqlalchemy.orm import Session, aliased, joinedload
+from typing import List, Optional
 
 from database import get_db
-from models import User, Record, Comment
+from models import User, Record, Comment, Tombstone
 from schemas import RecordCreate, RecordUpdate, RecordResponse
 from auth import get_current_user
+from owners import visible_owner_ids, visible_records_query
+import search as record_search
+import summaries
+import tags as record_tags
+from etag import etag_guard
+import fast_json
+import presummarize
+from versions import add_tombstone, add_tombstones, bump_version, decode_sync_token, encode_sync_token, get_versions
+from routers.comments import comment_to_dict
 
 router = APIRouter(prefix="/api/records", tags=["records"])
 
 
 def record_to_dict(r: Record, *, has_commented: bool = False) -> dict:
-    """將 Record ORM 物件轉為 API 回應格式"""
+    """將 Record ORM 物件轉為 API 回應格式
+
+    createdAt / updatedAt 為 datetime 物件而非字串：須由 fast_json 或 FastAPI 的
+    jsonable_encoder 輸出為 ISO 8601，不可直接交給標準 json.dumps。
+    """
     return {
         "id": r.id,
         "user_id": r.user_id,
@@ -21,84 +37,291 @@ def record_to_dict(r: Record, *, has_commented: bool = False) -> dict:
         "endTime": r.end_time,
         "title": r.title,
         "content": r.content,
-        "tags": json.loads(r.tags) if r.tags else [],
-        "createdAt": r.created_at.isoformat() if r.created_at else None,
-        "updatedAt": r.updated_at.isoformat() if r.updated_at else None,
+        "tags": fast_json.loads(r.tags) if r.tags else [],
+        "createdAt": r.created_at,
+        "updatedAt": r.updated_at,
         "hasCommented": has_commented,
     }
 
 
-@router.get("")
+def _sort_key_columns(model, sort: str) -> list:
+    """各排序模式的 keyset 欄位（最後以 id 打破平手）
+
+    created_at 以字串型別讀取與比較，游標保存資料庫內的原值，不經 datetime 轉換而改變格式。
+    """
+    created_at = type_coerce(model.created_at, String)
+    if sort == "title":
+        return [model.title, model.date, created_at, model.id]
+    return [model.date, created_at, model.id]
+
+
+def encode_cursor(sort: str, key: list, rank: Optional[float] = None) -> str:
+    """產生不透明的分頁游標（排序模式 + 最後一筆的排序鍵，相關度排序另附分數）"""
+    data = {"s": sort, "k": [v.isoformat() if isinstance(v, datetime) else v for v in key]}
+    if rank is not None:
+        data["r"] = rank
+    raw = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    """解析分頁游標，回傳 (排序鍵, 分數)；格式錯誤或排序模式不符時回 400
+
+    游標只帶排序鍵的值，錨點紀錄之後被刪除也能繼續往下翻。
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key = data["k"]
+        cursor_sort = data["s"]
+        rank = data.get("r")
+    except Exception:
+        raise HTTPException(status_code=400, detail="分頁游標格式錯誤")
+    if cursor_sort != sort:
+        raise HTTPException(status_code=400, detail="分頁游標與排序方式不符")
+    expected = len(_sort_key_columns(Record, sort))
+    if not isinstance(key, list) or len(key) != expected or (sort == "relevance" and not isinstance(rank, (int, float))):
+        raise HTTPException(status_code=400, detail="分頁游標格式錯誤")
+    return key, rank
+
+
+@router.get("", dependencies=[Depends(etag_guard)])
 def get_records(
-    sort: str = Query("date-desc", regex="^(date-desc|date-asc|title)$"),
+    response: Response,
+    sort: str = Query("date-desc", regex="^(date-desc|date-asc|title|relevance)$"),
     search: Optional[str] = Query(None),
+    tag: Optional[List[str]] = Query(None, description="標籤完全相符；結尾加 * 為前綴比對，可重複指定（須全部符合）"),
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """取得紀錄：owner 只看自己的，viewer 看所有 owner 的紀錄"""
-    if current_user.role == 'viewer':
-        # viewer 看所有 owner 的紀錄
-        owner_ids = [u.id for u in db.query(User).filter(User.role == 'owner').all()]
-        query = db.query(Record).filter(Record.user_id.in_(owner_ids))
-    else:
-        query = db.query(Record).filter(Record.user_id == current_user.id)
-
-    # 搜尋（標題、內容）
-    if search and search.strip():
-        keyword = f"%{search.strip()}%"
+    """取得紀錄：owner 只看自己的，viewer 看所有 owner 的紀錄
+
+    帶 limit 時改用 keyset 分頁：依 (date, created_at, id) 排序取下一頁，
+    回傳 next_cursor 供下次請求使用；未帶 limit 時維持回傳全部紀錄。
+    搜尋時每筆附上 snippet 高亮片段（已跳脫 HTML）；sort=relevance 依相關度排序，同樣可用游標分頁。
+    """
+    query = visible_records_query(db, current_user)
+
+    # 標籤篩選：透過 record_tags 反向索引
+    for term in tag or []:
+        condition = record_tags.tag_filter(term)
+        if condition is None:
+            raise HTTPException(status_code=400, detail="標籤不可為空")
+        query = query.filter(condition)
+
+    # 搜尋（標題、內容、標籤）：優先使用 FTS5 索引，不支援時退回 LIKE 掃描
+    keyword = search.strip() if search else ""
+    match = record_search.build_match_query(keyword) if keyword and record_search.fts_enabled(db) else None
+    ranked = None
+    if match:
+        ranked = record_search.ranked_subquery(match)
+        query = query.join(ranked, ranked.c.record_id == Record.id)
+    elif keyword:
+        pattern = f"%{keyword}%"
         query = query.filter(
-            (Record.title.ilike(keyword)) |
-            (Record.content.ilike(keyword)) |
-            (Record.tags.ilike(keyword))
+            (Record.title.ilike(pattern)) |
+            (Record.content.ilike(pattern)) |
+            record_tags.tag_keyword_filter(pattern)
         )
 
+    if sort == "relevance" and ranked is None:
+        sort = "date-desc"
+
+    paginated = limit is not None or cursor is not None
+    total = query.count() if paginated else None
+
     # 排序
-    if sort == "date-asc":
-        query = query.order_by(Record.date.asc(), Record.created_at.asc())
-    elif sort == "title":
-        query = query.order_by(Record.title.asc())
-    else:  # date-desc（預設）
-        query = query.order_by(Record.date.desc(), Record.created_at.desc())
-
-    records = query.all()
+    key_columns = _sort_key_columns(Record, sort)
+    descending = sort in ("date-desc", "relevance")
+    if sort == "relevance":
+        query = query.order_by(ranked.c.rank.asc(), *[col.desc() for col in key_columns])
+    elif descending:
+        query = query.order_by(*[col.desc() for col in key_columns])
+    else:
+        query = query.order_by(*[col.asc() for col in key_columns])
+
+    # keyset 分頁：與游標內的排序鍵比較，不依賴錨點紀錄仍存在
+    if cursor:
+        anchor_key, anchor_rank = decode_cursor(cursor, sort)
+        row_key = tuple_(*key_columns)
+        after_anchor = row_key < tuple_(*anchor_key) if descending else row_key > tuple_(*anchor_key)
+        if sort == "relevance":
+            # 分數相同時再以日期鍵比較
+            after_anchor = or_(
+                ranked.c.rank > anchor_rank,
+                and_(ranked.c.rank == anchor_rank, after_anchor),
+            )
+        query = query.filter(after_anchor)
+
+    next_cursor = None
+    if paginated:
+        page_size = limit or 50
+        cursor_columns = key_columns + ([ranked.c.rank] if sort == "relevance" else [])
+        rows = query.add_columns(*cursor_columns).limit(page_size + 1).all()
+        records = [row[0] for row in rows[:page_size]]
+        if len(rows) > page_size:
+            last = rows[page_size - 1]
+            key = list(last[1:1 + len(key_columns)])
+            next_cursor = encode_cursor(sort, key, last[-1] if sort == "relevance" else None)
+    else:
+        records = query.all()
+        total = len(records)
+
     record_ids = [r.id for r in records]
-    commented_record_ids = set()
-    if record_ids:
-        commented_record_ids = {
-            row[0] for row in db.query(Comment.record_id)
-            .filter(Comment.user_id == current_user.id, Comment.record_id.in_(record_ids))
-            .distinct()
-            .all()
-        }
+    commented_record_ids = commented_record_ids_for(db, current_user.id, record_ids)
+    items = [record_to_dict(r, has_commented=(r.id in commented_record_ids)) for r in records]
+    if match:
+        snippets = record_search.fetch_snippets(db, match, record_ids)
+        for item in items:
+            item["snippet"] = snippets.get(item["id"])
+    elif keyword:
+        for item in items:
+            item["snippet"] = record_search.make_snippet(item["content"], keyword)
+
+    return fast_json.json_response({
+        "records": items,
+        "total": total,
+        "next_cursor": next_cursor,
+    }, response)
+
+
+@router.get("/stats", dependencies=[Depends(etag_guard)])
+def get_record_stats(
+    include_weeks: bool = Query(False, description="附上每週筆數與時數"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """儀表板統計：總筆數、實習時數、標籤數與日期跨度（讀取彙總表，不掃描紀錄）"""
+    user_ids = visible_owner_ids(db, current_user)
+    return {"stats": summaries.read_stats(db, user_ids, include_weeks=include_weeks)}
+
+
+def commented_record_ids_for(db: Session, user_id: str, record_ids: list) -> set:
+    """record_ids 中目前用戶留過言的紀錄"""
+    if not record_ids:
+        return set()
     return {
-        "records": [record_to_dict(r, has_commented=(r.id in commented_record_ids)) for r in records],
-        "total": len(records)
+        row[0] for row in db.query(Comment.record_id)
+        .filter(Comment.user_id == user_id, Comment.record_id.in_(record_ids))
+        .distinct()
+        .all()
     }
 
 
-@router.get("/{record_id}/adjacent")
+def _parse_since(since: Optional[str], owner_ids: tuple) -> Optional[dict]:
+    """since 可為 /api/sync/version 或本端點回傳的游標；只有一位 owner 時也接受版本號"""
+    if not since:
+        return None
+    if since.isdigit():
+        if len(owner_ids) != 1:
+            raise HTTPException(status_code=400, detail="可見多位 owner 時請使用同步游標")
+        return {owner_ids[0]: int(since)}
+    try:
+        return decode_sync_token(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="同步游標格式錯誤")
+
+
+@router.get("/changes", dependencies=[Depends(etag_guard)])
+def get_record_changes(
+    response: Response,
+    since: Optional[str] = Query(None, description="上次同步的游標；省略時回傳完整快照"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """增量同步：since 之後新增／修改的紀錄與留言，以及被刪除的 id（墓碑）
+
+    next_since 帶入下次請求即可；先讀版本再查變動，期間的新寫入最多重複送出，不會遺漏。
+    """
+    owner_ids = visible_owner_ids(db, current_user)
+    versions = get_versions(db, owner_ids)
+    baseline = _parse_since(since, owner_ids)
+
+    records_query = visible_records_query(db, current_user)
+    comments_query = db.query(Comment).options(joinedload(Comment.user)).join(
+        Record, Record.id == Comment.record_id
+    ).filter(Record.user_id.in_(owner_ids))
+    deleted = {"records": [], "comments": []}
+
+    if baseline is not None and owner_ids:
+        def changed_since(version_column, owner_column):
+            return or_(*[
+                and_(owner_column == owner_id, version_column > baseline.get(owner_id, 0))
+                for owner_id in owner_ids
+            ])
+
+        records_query = records_query.filter(changed_since(Record.version, Record.user_id))
+        comments_query = comments_query.filter(changed_since(Comment.version, Record.user_id))
+        tombstones = db.query(Tombstone.entity, Tombstone.entity_id).filter(
+            changed_since(Tombstone.version, Tombstone.owner_id)
+        ).order_by(Tombstone.version.asc())
+        for entity, entity_id in tombstones:
+            deleted.setdefault(f"{entity}s", []).append(entity_id)
+
+    records = records_query.order_by(Record.version.asc()).all()
+    comments = comments_query.order_by(Comment.version.asc()).all()
+    commented_record_ids = commented_record_ids_for(db, current_user.id, [r.id for r in records])
+
+    return fast_json.json_response({
+        "full": baseline is None,
+        "records": [record_to_dict(r, has_commented=(r.id in commented_record_ids)) for r in records],
+        "comments": [comment_to_dict(c) for c in comments],
+        "deleted": deleted,
+        "version": sum(versions.values()),
+        "next_since": encode_sync_token(versions),
+    }, response)
+
+
+@router.get("/tags", dependencies=[Depends(etag_guard)])
+def get_tag_cloud(
+    prefix: Optional[str] = Query(None, description="只列出此前綴的標籤（自動完成用）"),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """標籤雲：各標籤的紀錄數，依次數降冪"""
+    user_ids = visible_owner_ids(db, current_user)
+    prefix = prefix.strip() if prefix else None
+    return {"tags": record_tags.tag_cloud(db, user_ids, prefix=prefix, limit=limit)}
+
+
+def find_adjacent(visible_query, record_id: str):
+    """以兩次索引 seek 找出時間軸上的上/下一篇（依 date, created_at, id 降冪）
+
+    visible_query 為目前用戶可見紀錄的查詢；紀錄不存在時回傳 None。
+    """
+    if not visible_query.filter(Record.id == record_id).with_entities(Record.id).first():
+        return None
+
+    anchor = aliased(Record)
+    row_key = tuple_(*_sort_key_columns(Record, "date-desc"))
+    anchor_key = tuple_(*_sort_key_columns(anchor, "date-desc"))
+    seek = visible_query.join(anchor, anchor.id == record_id)
+
+    prev_record = seek.filter(row_key > anchor_key).order_by(
+        *[col.asc() for col in _sort_key_columns(Record, "date-desc")]
+    ).first()
+    next_record = seek.filter(row_key < anchor_key).order_by(
+        *[col.desc() for col in _sort_key_columns(Record, "date-desc")]
+    ).first()
+    return prev_record, next_record
+
+
+@router.get("/{record_id}/adjacent", dependencies=[Depends(etag_guard)])
 def get_adjacent_records(
     record_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """取得上/下一篇紀錄"""
-    if current_user.role == 'viewer':
-        owner_ids = [u.id for u in db.query(User).filter(User.role == 'owner').all()]
-        all_records = db.query(Record).filter(
-            Record.user_id.in_(owner_ids)
-        ).order_by(Record.date.desc(), Record.created_at.desc()).all()
-    else:
-        all_records = db.query(Record).filter(
-            Record.user_id == current_user.id
-        ).order_by(Record.date.desc(), Record.created_at.desc()).all()
+    query = visible_records_query(db, current_user)
 
-    idx = next((i for i, r in enumerate(all_records) if r.id == record_id), None)
-    if idx is None:
+    adjacent = find_adjacent(query, record_id)
+    if adjacent is None:
         raise HTTPException(status_code=404, detail="紀錄不存在")
-
-    prev_record = all_records[idx - 1] if idx > 0 else None
-    next_record = all_records[idx + 1] if idx < len(all_records) - 1 else None
+    prev_record, next_record = adjacent
 
     return {
         "prev": record_to_dict(prev_record) if prev_record else None,
@@ -106,29 +329,29 @@ def get_adjacent_records(
     }
 
 
-@router.get("/{record_id}")
+@router.get("/{record_id}", dependencies=[Depends(etag_guard)])
 def get_record(
     record_id: str,
+    include_adjacent: bool = Query(False),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """取得單筆紀錄（viewer 可看 owner 的紀錄）"""
-    if current_user.role == 'viewer':
-        owner_ids = [u.id for u in db.query(User).filter(User.role == 'owner').all()]
-        record = db.query(Record).filter(
-            Record.id == record_id,
-            Record.user_id.in_(owner_ids)
-        ).first()
-    else:
-        record = db.query(Record).filter(
-            Record.id == record_id,
-            Record.user_id == current_user.id
-        ).first()
+    """取得單筆紀錄（viewer 可看 owner 的紀錄）
 
+    include_adjacent=true 時一併回傳上/下一篇，省去額外的 /adjacent 請求。
+    """
+    query = visible_records_query(db, current_user)
+
+    record = query.filter(Record.id == record_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="紀錄不存在")
 
-    return {"record": record_to_dict(record)}
+    result = {"record": record_to_dict(record)}
+    if include_adjacent:
+        prev_record, next_record = find_adjacent(query, record_id)
+        result["prev"] = record_to_dict(prev_record) if prev_record else None
+        result["next"] = record_to_dict(next_record) if next_record else None
+    return result
 
 
 @router.post("", status_code=201)
@@ -140,6 +363,7 @@ def create_record(
     """新增紀錄"""
     if current_user.role != 'owner':
         raise HTTPException(status_code=403, detail="無編輯權限")
+    tag_names = record_tags.normalize_tags(req.tags)
     record = Record(
         user_id=current_user.id,
         date=req.date,
@@ -147,11 +371,18 @@ def create_record(
         end_time=req.end_time,
         title=req.title,
         content=req.content,
-        tags=json.dumps(req.tags or [], ensure_ascii=False)
+        tags=json.dumps(tag_names, ensure_ascii=False),
+        # 版本在 INSERT 前取得；flush 後再指派會多一次 UPDATE 並觸發 updated_at
+        version=bump_version(db, current_user.id) or 0,
     )
     db.add(record)
+    db.flush()
+    record_tags.set_record_tags(db, record.id, tag_names)
+    record_search.index_record(db, record)
+    summaries.record_created(db, record)
     db.commit()
     db.refresh(record)
+    presummarize.enqueue(record.id)
 
     return {"record": record_to_dict(record)}
 
@@ -174,6 +405,7 @@ def update_record(
     if not record:
         raise HTTPException(status_code=404, detail="紀錄不存在或無權限")
 
+    before = summaries.snapshot(record)
     if req.date is not None:
         record.date = req.date
     if req.start_time is not None:
@@ -185,10 +417,16 @@ def update_record(
     if req.content is not None:
         record.content = req.content
     if req.tags is not None:
-        record.tags = json.dumps(req.tags, ensure_ascii=False)
+        tag_names = record_tags.normalize_tags(req.tags)
+        record.tags = json.dumps(tag_names, ensure_ascii=False)
+        record_tags.set_record_tags(db, record.id, tag_names)
 
+    record_search.index_record(db, record)
+    summaries.record_updated(db, before, record)
+    record.version = bump_version(db, current_user.id)
     db.commit()
     db.refresh(record)
+    presummarize.enqueue(record.id)
 
     return {"record": record_to_dict(record)}
 
@@ -199,7 +437,7 @@ def delete_record(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """刪除紀錄（驗證擁有權）"""
+    """刪除紀錄（驗證擁有權），連同其留言一併刪除並留下墓碑"""
     if current_user.role != 'owner':
         raise HTTPException(status_code=403, detail="無編輯權限")
     record = db.query(Record).filter(
@@ -210,7 +448,18 @@ def delete_record(
     if not record:
         raise HTTPException(status_code=404, detail="紀錄不存在或無權限")
 
+    before = summaries.snapshot(record)
+    before_id = record.id
+    record_search.unindex_record(db, record.id)
+    record_tags.remove_record_tags(db, record.id)
+    # SQLite 未啟用外鍵，留言不會隨紀錄刪除，須明確刪除才不會留下孤兒資料
+    comments = db.query(Comment).filter(Comment.record_id == record.id)
+    comment_ids = [row[0] for row in comments.with_entities(Comment.id).all()]
+    comments.delete(synchronize_session=False)
     db.delete(record)
+    summaries.record_deleted(db, before)
+    add_tombstones(db, current_user.id, "comment", comment_ids)
+    add_tombstone(db, current_user.id, "record", before_id)
     db.commit()
 
     return {"success": True}
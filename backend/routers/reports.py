@@ -0,0 +1,63 @@
+import re
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session, joinedload
+
+from database import get_db
+from models import User, Record, Comment
+from auth import get_current_user
+from owners import visible_records_query
+from hours import calculate_record_hours
+from routers.records import record_to_dict
+from routers.comments import comment_to_dict
+from routers.llm import summary_cache_key
+import fast_json
+
+router = APIRouter(prefix="/api/reports", tags=["reports"])
+
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+@router.get("/range")
+def get_report_range(
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """週報資料：日期區間內的紀錄（依日期遞增）、各自的留言、工時與預先產生的摘要，一次回傳"""
+    if not _DATE.match(date_from) or not _DATE.match(date_to):
+        raise HTTPException(status_code=400, detail="日期格式須為 YYYY-MM-DD")
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="起始日期不可晚於結束日期")
+
+    # (user_id, date) 複合索引上的區間掃描
+    records = visible_records_query(db, current_user).filter(
+        Record.date >= date_from,
+        Record.date <= date_to,
+    ).order_by(Record.date.asc(), Record.created_at.asc(), Record.id.asc()).all()
+
+    comments_by_record = {r.id: [] for r in records}
+    if records:
+        comments = db.query(Comment).options(joinedload(Comment.user)).filter(
+            Comment.record_id.in_(list(comments_by_record))
+        ).order_by(Comment.created_at.asc()).all()
+        for c in comments:
+            comments_by_record[c.record_id].append(comment_to_dict(c))
+
+    items = []
+    total_hours = 0.0
+    for r in records:
+        item = record_to_dict(r)
+        item["hours"] = calculate_record_hours(r.start_time, r.end_time)
+        item["comments"] = comments_by_record[r.id]
+        # 背景預先產生的摘要，內容已變更（雜湊不符）時視為沒有
+        item["summary"] = r.feedback if r.feedback and r.summary_hash == summary_cache_key(r.content) else None
+        total_hours += item["hours"]
+        items.append(item)
+
+    return fast_json.json_response({
+        "from": date_from,
+        "to": date_to,
+        "records": items,
+        "total_hours": round(total_hours, 2),
+    })
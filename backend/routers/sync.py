@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import User
+from auth import get_current_user
+from owners import visible_owner_ids
+from versions import encode_sync_token, get_versions
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+
+@router.get("/version")
+def get_sync_version(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """可見資料的版本：versions 為各 owner 的版本，version 為其總和（任一 owner 有寫入即增加），
+    token 可作為 /api/records/changes 的 since"""
+    versions = get_versions(db, visible_owner_ids(db, current_user))
+    return {
+        "version": sum(versions.values()),
+        "versions": versions,
+        "token": encode_sync_token(versions),
+    }
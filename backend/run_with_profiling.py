@@ -28,8 +28,9 @@ if __name__ == "__main__":
     print("🚀 mySite FastAPI Backend with Profiling Middleware")
     print("="*80)
     print("\n📊 Profiling 已啟用！")
-    print("   - 每個 API 請求都會被記錄")
-    print("   - 測量執行時間和記憶體使用")
+    print("   - 每個 API 請求都會被記錄（PROFILING_SAMPLE_RATE 控制取樣比例）")
+    print("   - 以 PROFILING_INCLUDE / PROFILING_EXCLUDE 設定路徑前綴規則")
+    print("   - 日誌由背景執行緒批次寫入 profiling_logs/")
     print("   - 按 Ctrl+C 停止並查看完整報告")
     print("\n🧪 測試方式：")
     print("   在另一個終端執行：")
@@ -38,7 +39,6 @@ if __name__ == "__main__":
     print("   3. 或在瀏覽器開啟前端頁面進行操作")
     print("\n⏱️  每個請求的執行時間會顯示在 Response Header 中：")
     print("   - X-Process-Time: 執行時間（毫秒）")
-    print("   - X-Memory-Delta: 記憶體變化（MB）")
     print("\n" + "="*80 + "\n")
 
     # 啟動伺服器
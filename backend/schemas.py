@@ -57,6 +57,14 @@ class RecordResponse(BaseModel):
         from_attributes = True
 
 
+# ===== Comment Schemas =====
+
+class CommentBatchRequest(BaseModel):
+    record_ids: Optional[List[str]] = None
+    date_from: Optional[str] = None   # "YYYY-MM-DD"
+    date_to: Optional[str] = None     # "YYYY-MM-DD"
+
+
 # ===== Profile Schemas =====
 
 class ProfileUpdate(BaseModel):
@@ -88,5 +96,9 @@ class ProfileResponse(BaseModel):
 class SummarizeRequest(BaseModel):
     content: str
 
+class SummarizeBatchRequest(BaseModel):
+    contents: List[str]
+
 class SummarizeResponse(BaseModel):
     summary: str
+    cached: bool = False
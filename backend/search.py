@@ -0,0 +1,167 @@
+"""
+紀錄全文檢索
+SQLite 使用 FTS5 trigram 索引（支援中文子字串搜尋），其他資料庫退回 ILIKE 掃描
+"""
+import html
+import json
+from typing import Optional
+
+from sqlalchemy import text, bindparam, String, Float
+from sqlalchemy.orm import Session
+
+FTS_TABLE = "records_fts"
+
+# trigram tokenizer 至少需要 3 個字元才能使用索引
+MIN_TERM_LENGTH = 3
+
+SNIPPET_OPEN = "<mark>"
+SNIPPET_CLOSE = "</mark>"
+SNIPPET_TOKENS = 16
+
+# snippet() 先以 Unicode 私用區字元標出命中位置，跳脫 HTML 後才換成 <mark>
+_MARK_OPEN = "\ue000"
+_MARK_CLOSE = "\ue001"
+
+_fts_available = False
+
+
+def setup_fts(engine) -> bool:
+    """建立 FTS5 虛擬資料表並在索引與 records 筆數不一致時重建，回傳是否啟用"""
+    global _fts_available
+
+    if engine.dialect.name != "sqlite":
+        _fts_available = False
+        return False
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "record_id UNINDEXED, title, content, tags, tokenize='trigram')"
+            ))
+            conn.commit()
+    except Exception:
+        _fts_available = False  # SQLite 版本過舊（< 3.34）或未編譯 FTS5
+        return False
+
+    _fts_available = True
+
+    with Session(bind=engine) as db:
+        indexed = db.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+        total = db.execute(text("SELECT count(*) FROM records")).scalar()
+        if indexed != total:
+            rebuild_index(db)
+            db.commit()
+
+    return True
+
+
+def fts_enabled(db: Session) -> bool:
+    return _fts_available and db.bind.dialect.name == "sqlite"
+
+
+def _tags_text(tags_json: Optional[str]) -> str:
+    """將 JSON 標籤陣列轉為以空白分隔的純文字，避免比對到 JSON 標點"""
+    try:
+        tags = json.loads(tags_json) if tags_json else []
+    except ValueError:
+        return ""
+    return " ".join(str(t) for t in tags)
+
+
+def index_record(db: Session, record) -> None:
+    """新增或更新紀錄的索引（與紀錄寫入在同一個交易中）"""
+    if not fts_enabled(db):
+        return
+    unindex_record(db, record.id)
+    db.execute(
+        text(f"INSERT INTO {FTS_TABLE} (record_id, title, content, tags) VALUES (:id, :title, :content, :tags)"),
+        {"id": record.id, "title": record.title, "content": record.content, "tags": _tags_text(record.tags)},
+    )
+
+
+def unindex_record(db: Session, record_id: str) -> None:
+    if not fts_enabled(db):
+        return
+    db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE record_id = :id"), {"id": record_id})
+
+
+def rebuild_index(db: Session) -> int:
+    """清空並從 records 重建索引，回傳索引筆數"""
+    from models import Record
+
+    db.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    count = 0
+    for record in db.query(Record.id, Record.title, Record.content, Record.tags).yield_per(500):
+        db.execute(
+            text(f"INSERT INTO {FTS_TABLE} (record_id, title, content, tags) VALUES (:id, :title, :content, :tags)"),
+            {"id": record.id, "title": record.title, "content": record.content, "tags": _tags_text(record.tags)},
+        )
+        count += 1
+    return count
+
+
+def build_match_query(keyword: str) -> Optional[str]:
+    """將使用者輸入轉為 FTS5 MATCH 語法：整串關鍵字（含空白）作為單一片語
+
+    與 LIKE '%keyword%' 相同，多個詞須依序連續出現；短於 trigram 最小長度時回傳 None，
+    由呼叫端改用 LIKE。
+    """
+    keyword = keyword.strip()
+    if len(keyword) < MIN_TERM_LENGTH:
+        return None
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+def ranked_subquery(match: str):
+    """符合搜尋條件的 record_id 與 bm25 分數（越小越相關，標題權重最高）"""
+    return (
+        text(
+            f"SELECT record_id, bm25({FTS_TABLE}, 0.0, 10.0, 1.0, 5.0) AS rank "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+        )
+        .bindparams(match=match)
+        .columns(record_id=String, rank=Float)
+        .subquery("fts_ranked")
+    )
+
+
+def _render_snippet(raw: str) -> str:
+    return html.escape(raw).replace(_MARK_OPEN, SNIPPET_OPEN).replace(_MARK_CLOSE, SNIPPET_CLOSE)
+
+
+def fetch_snippets(db: Session, match: str, record_ids: list) -> dict:
+    """取得內容欄位的高亮摘要片段：{record_id: snippet}
+
+    片段為已跳脫的 HTML，只有命中處包在 <mark> 內，可直接以 innerHTML 顯示。
+    """
+    if not record_ids:
+        return {}
+    stmt = text(
+        f"SELECT record_id, snippet({FTS_TABLE}, 2, :open, :close, '…', :tokens) "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match AND record_id IN :ids"
+    ).bindparams(bindparam("ids", expanding=True))
+    rows = db.execute(stmt, {
+        "open": _MARK_OPEN, "close": _MARK_CLOSE, "tokens": SNIPPET_TOKENS,
+        "match": match, "ids": list(record_ids),
+    }).all()
+    return {row[0]: _render_snippet(row[1]) for row in rows if row[1] is not None}
+
+
+def make_snippet(content: str, keyword: str, width: int = 40) -> Optional[str]:
+    """無 FTS 時的摘要片段：在內容中找出第一個關鍵字並前後各取 width 字元（已跳脫 HTML）"""
+    if not content:
+        return None
+    keyword = keyword.strip()
+    pos = content.lower().find(keyword.lower()) if keyword else -1
+    if pos < 0:
+        return html.escape(content[:width * 2]) + ("…" if len(content) > width * 2 else "")
+    start = max(pos - width, 0)
+    end = min(pos + len(keyword) + width, len(content))
+    return (
+        ("…" if start > 0 else "")
+        + html.escape(content[start:pos])
+        + SNIPPET_OPEN + html.escape(content[pos:pos + len(keyword)]) + SNIPPET_CLOSE
+        + html.escape(content[pos + len(keyword):end])
+        + ("…" if end < len(content) else "")
+    )
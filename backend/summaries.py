@@ -0,0 +1,273 @@
+"""
+每位用戶的紀錄彙總
+record_summaries / summary_tags / summary_weeks 於紀錄新增、修改、刪除時
+在同一個交易內更新，統計讀取只需主鍵查詢：
+筆數、首末日期與受影響的週以索引查詢重新計算，總時數以分鐘取整後增減且不小於 0
+"""
+import json
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import Float, case, func
+from sqlalchemy.orm import Session
+
+from hours import calculate_record_hours
+from models import Record, RecordSummary, RecordTag, SummaryTag, SummaryWeek
+from tags import normalize_tags
+
+
+def week_start(date_str: Optional[str]) -> Optional[str]:
+    """該日所在週的週一（YYYY-MM-DD），日期格式錯誤時回傳 None"""
+    try:
+        d = date.fromisoformat(date_str)
+    except (TypeError, ValueError):
+        return None
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+
+def day_span(first_date: Optional[str], last_date: Optional[str]) -> int:
+    """首末日期涵蓋的天數（含頭尾）"""
+    if not first_date or not last_date:
+        return 0
+    try:
+        return (date.fromisoformat(last_date) - date.fromisoformat(first_date)).days + 1
+    except ValueError:
+        return 0
+
+
+def _parse_tags(tags_json: Optional[str]) -> list:
+    """與 record_tags 相同經 normalize_tags，標籤雲與 ?tag= 篩選才會一致"""
+    try:
+        return normalize_tags(json.loads(tags_json) if tags_json else [])
+    except ValueError:
+        return []
+
+
+def snapshot(record: Record) -> dict:
+    """記下紀錄修改前會影響彙總的欄位"""
+    return {
+        "user_id": record.user_id,
+        "date": record.date,
+        "start_time": record.start_time,
+        "end_time": record.end_time,
+        "tags": record.tags,
+    }
+
+
+def _increment(column, delta):
+    """遞增後的值不小於 0；時數以分鐘取整，加減多次也不會累積浮點誤差"""
+    value = column + delta
+    if isinstance(column.type, Float):
+        value = func.round(value * 60) / 60.0
+    return case((value < 0, 0), else_=value)
+
+
+def _bump(db: Session, model, keys: dict, deltas: dict, create: bool) -> None:
+    """以 SQL 運算式遞增欄位；資料列不存在且 create 為 True 時新增（遞減時不建立負值列）"""
+    updated = db.query(model).filter_by(**keys).update(
+        {getattr(model, col): _increment(getattr(model, col), delta) for col, delta in deltas.items()},
+        synchronize_session=False,
+    )
+    if not updated and create:
+        db.add(model(**keys, **deltas))
+        db.flush()
+
+
+def _apply(db: Session, values: dict, sign: int) -> None:
+    """總時數與標籤次數的增減；筆數、日期與週彙總由 _refresh 重新計算"""
+    user_id = values["user_id"]
+    hours = calculate_record_hours(values["start_time"], values["end_time"])
+
+    _bump(db, RecordSummary, {"user_id": user_id}, {"total_hours": sign * hours}, create=sign > 0)
+
+    for tag in _parse_tags(values["tags"]):
+        _bump(db, SummaryTag, {"user_id": user_id, "tag": tag}, {"count": sign}, create=sign > 0)
+
+    if sign < 0:
+        db.query(SummaryTag).filter(SummaryTag.user_id == user_id, SummaryTag.count <= 0).delete(
+            synchronize_session=False
+        )
+
+
+def _refresh_week(db: Session, user_id: str, week: str) -> None:
+    """以 (user_id, date) 索引取該週的紀錄重新計算，不以增減累加"""
+    week_end = (date.fromisoformat(week) + timedelta(days=6)).isoformat()
+    rows = db.query(Record.date, Record.start_time, Record.end_time).filter(
+        Record.user_id == user_id, Record.date >= week, Record.date <= week_end
+    ).all()
+    rows = [r for r in rows if week_start(r.date) == week]
+
+    keys = {"user_id": user_id, "week_start": week}
+    if not rows:
+        db.query(SummaryWeek).filter_by(**keys).delete(synchronize_session=False)
+        return
+    values = {
+        "record_count": len(rows),
+        "total_hours": sum(calculate_record_hours(r.start_time, r.end_time) for r in rows),
+    }
+    if not db.query(SummaryWeek).filter_by(**keys).update(values, synchronize_session=False):
+        db.add(SummaryWeek(**keys, **values))
+
+
+def _refresh(db: Session, user_id: str, dates) -> None:
+    """重新計算筆數、首末日期（(user_id, date) 索引）與 dates 所在的週"""
+    db.flush()
+    count, first_date, last_date = db.query(
+        func.count(Record.id), func.min(Record.date), func.max(Record.date)
+    ).filter(Record.user_id == user_id).one()
+    summary = db.query(RecordSummary).filter(RecordSummary.user_id == user_id)
+    if count:
+        summary.update(
+            {RecordSummary.record_count: count, RecordSummary.first_date: first_date,
+             RecordSummary.last_date: last_date},
+            synchronize_session=False,
+        )
+    else:
+        summary.delete(synchronize_session=False)
+
+    for week in {week_start(d) for d in dates} - {None}:
+        _refresh_week(db, user_id, week)
+
+
+def record_created(db: Session, record: Record) -> None:
+    _apply(db, snapshot(record), +1)
+    _refresh(db, record.user_id, [record.date])
+
+
+def record_updated(db: Session, before: dict, record: Record) -> None:
+    _apply(db, before, -1)
+    _apply(db, snapshot(record), +1)
+    _refresh(db, record.user_id, [before["date"], record.date])
+
+
+def record_deleted(db: Session, before: dict) -> None:
+    """須在 db.delete(record) 之後、commit 之前呼叫"""
+    _apply(db, before, -1)
+    _refresh(db, before["user_id"], [before["date"]])
+
+
+def read_stats(db: Session, user_ids, include_weeks: bool = False) -> dict:
+    """彙總多位用戶的統計（viewer 看所有 owner 的合計）"""
+    user_ids = list(user_ids)
+    rows = db.query(RecordSummary).filter(RecordSummary.user_id.in_(user_ids)).all() if user_ids else []
+
+    total_records = sum(r.record_count for r in rows)
+    first_dates = [r.first_date for r in rows if r.first_date]
+    last_dates = [r.last_date for r in rows if r.last_date]
+    first_date = min(first_dates) if first_dates else None
+    last_date = max(last_dates) if last_dates else None
+
+    total_tags = 0
+    if user_ids:
+        total_tags = db.query(func.count(func.distinct(SummaryTag.tag))).filter(
+            SummaryTag.user_id.in_(user_ids), SummaryTag.count > 0
+        ).scalar()
+
+    stats = {
+        "total_records": total_records,
+        "total_hours": round(sum((r.total_hours for r in rows), 0.0), 1),
+        "total_tags": total_tags,
+        "first_date": first_date,
+        "last_date": last_date,
+        "day_count": day_span(first_date, last_date),
+    }
+
+    if include_weeks:
+        weeks = db.query(
+            SummaryWeek.week_start,
+            func.sum(SummaryWeek.record_count),
+            func.sum(SummaryWeek.total_hours),
+        ).filter(SummaryWeek.user_id.in_(user_ids)).group_by(SummaryWeek.week_start).order_by(
+            SummaryWeek.week_start.asc()
+        ).all() if user_ids else []
+        stats["weeks"] = [
+            {"week_start": w, "record_count": n, "total_hours": round(h or 0.0, 1)}
+            for w, n, h in weeks
+        ]
+
+    return stats
+
+
+def rebuild(db: Session, user_id: Optional[str] = None) -> int:
+    """清空並從 records 重新計算彙總（指定 user_id 時只重建該用戶），回傳處理的紀錄數"""
+    for model in (RecordSummary, SummaryTag, SummaryWeek):
+        q = db.query(model)
+        if user_id:
+            q = q.filter(model.user_id == user_id)
+        q.delete(synchronize_session=False)
+
+    summaries, weeks, tags = {}, {}, {}
+    records = db.query(Record.user_id, Record.date, Record.start_time, Record.end_time, Record.tags)
+    if user_id:
+        records = records.filter(Record.user_id == user_id)
+
+    count = 0
+    for uid, record_date, start_time, end_time, tags_json in records.yield_per(1000):
+        count += 1
+        hours = calculate_record_hours(start_time, end_time)
+        s = summaries.setdefault(uid, {"record_count": 0, "total_hours": 0.0, "first_date": None, "last_date": None})
+        s["record_count"] += 1
+        s["total_hours"] += hours
+        if record_date:
+            s["first_date"] = min(filter(None, [s["first_date"], record_date]))
+            s["last_date"] = max(filter(None, [s["last_date"], record_date]))
+        week = week_start(record_date)
+        if week:
+            w = weeks.setdefault((uid, week), {"record_count": 0, "total_hours": 0.0})
+            w["record_count"] += 1
+            w["total_hours"] += hours
+        for tag in _parse_tags(tags_json):
+            tags[(uid, tag)] = tags.get((uid, tag), 0) + 1
+
+    db.bulk_insert_mappings(RecordSummary, [{"user_id": uid, **s} for uid, s in summaries.items()])
+    db.bulk_insert_mappings(SummaryWeek, [
+        {"user_id": uid, "week_start": week, **w} for (uid, week), w in weeks.items()
+    ])
+    db.bulk_insert_mappings(SummaryTag, [
+        {"user_id": uid, "tag": tag, "count": n} for (uid, tag), n in tags.items()
+    ])
+    return count
+
+
+def is_consistent(db: Session, check_hours: bool = False) -> bool:
+    """彙總的筆數與標籤次數是否與 records / record_tags 相符，且沒有負值的資料列
+
+    只比對 COUNT，不掃描紀錄內容；check_hours=True 時另逐筆重算總時數（O(n)，供 rebuild_summaries.py --check 使用）。
+    """
+    summarized_count, summarized_hours = db.query(
+        func.coalesce(func.sum(RecordSummary.record_count), 0),
+        func.coalesce(func.sum(RecordSummary.total_hours), 0.0),
+    ).one()
+    if summarized_count != db.query(func.count(Record.id)).scalar():
+        return False
+    # 兩者都以 normalize_tags 後的名稱計數，總數應相同
+    tag_count = db.query(func.coalesce(func.sum(SummaryTag.count), 0)).scalar()
+    if tag_count != db.query(func.count()).select_from(RecordTag).scalar():
+        return False
+    negative = (
+        db.query(RecordSummary.user_id).filter(RecordSummary.total_hours < 0).first()
+        or db.query(SummaryWeek.user_id).filter(SummaryWeek.total_hours < 0).first()
+        or db.query(SummaryTag.user_id).filter(SummaryTag.count <= 0).first()
+    )
+    if negative is not None:
+        return False
+    if check_hours:
+        hours = 0.0
+        for start_time, end_time in db.query(Record.start_time, Record.end_time).yield_per(1000):
+            hours += calculate_record_hours(start_time, end_time)
+        if abs(summarized_hours - hours) > 0.01:
+            return False
+    return True
+
+
+def ensure_summaries(engine) -> bool:
+    """啟動時以筆數檢查彙總是否與 records 一致，不一致時全部重建；回傳是否重建
+
+    每次啟動都會執行，因此不逐筆重算時數；時數的完整檢查交給 rebuild_summaries.py --check。
+    """
+    with Session(bind=engine) as db:
+        if is_consistent(db):
+            return False
+        rebuild(db)
+        db.commit()
+        return True
@@ -0,0 +1,160 @@
+"""
+紀錄標籤
+Record.tags 仍保留 JSON 陣列供顯示；tags / record_tags 為正規化的反向索引，
+標籤篩選與搜尋以 tag 名稱索引查詢，不再對 JSON 字串做 LIKE 比對
+"""
+import json
+from typing import Optional
+
+from sqlalchemy import and_, exists, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import Record, RecordTag, SummaryTag, Tag
+
+# ?tag=py* 表示前綴比對
+PREFIX_WILDCARD = "*"
+
+# 前綴比對以 [prefix, prefix + 最大字元) 的範圍查詢，可使用 name 的索引
+_PREFIX_UPPER = "\U0010ffff"
+
+
+def normalize_tags(names) -> list:
+    """去除前後空白、空字串與重複標籤，保留原本順序"""
+    result = []
+    seen = set()
+    for name in names or []:
+        name = str(name).strip()
+        if name and name not in seen:
+            seen.add(name)
+            result.append(name)
+    return result
+
+
+# 支援 INSERT ... ON CONFLICT DO NOTHING 的方言
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _get_or_create_tag_ids(db: Session, names: list) -> list:
+    """建立缺少的標籤並依 names 順序回傳 id，併發寫入同名標籤時不會違反唯一索引
+
+    SQLite / PostgreSQL 以 INSERT ... ON CONFLICT DO NOTHING 一次建立；其他資料庫先查出既有標籤，
+    缺少的逐一在 SAVEPOINT 內新增，唯一索引衝突（其他請求剛建立）時略過。
+    """
+    insert = _UPSERT_INSERTS.get(db.bind.dialect.name)
+    if insert is not None:
+        db.execute(insert(Tag).values([{"name": name} for name in names]).on_conflict_do_nothing(
+            index_elements=[Tag.name]
+        ))
+    else:
+        existing = {row[0] for row in db.query(Tag.name).filter(Tag.name.in_(names)).all()}
+        for name in names:
+            if name in existing:
+                continue
+            try:
+                with db.begin_nested():
+                    db.execute(Tag.__table__.insert().values(name=name))
+            except IntegrityError:
+                pass  # 其他請求已建立同名標籤
+    ids = dict(db.query(Tag.name, Tag.id).filter(Tag.name.in_(names)).all())
+    return [ids[name] for name in names]
+
+
+def _record_tag_ids(db: Session, record_id: str) -> list:
+    return [row[0] for row in db.query(RecordTag.tag_id).filter(RecordTag.record_id == record_id).all()]
+
+
+def prune_tags(db: Session, tag_ids=None) -> None:
+    """刪除已沒有任何紀錄使用的標籤（指定 tag_ids 時只檢查這些）"""
+    query = db.query(Tag).filter(~exists().where(RecordTag.tag_id == Tag.id))
+    if tag_ids is not None:
+        if not tag_ids:
+            return
+        query = query.filter(Tag.id.in_(list(tag_ids)))
+    query.delete(synchronize_session=False)
+
+
+def set_record_tags(db: Session, record_id: str, names: list) -> None:
+    """以 names 取代紀錄的標籤關聯（names 須先經 normalize_tags），並清掉因此不再使用的標籤"""
+    old_ids = _record_tag_ids(db, record_id)
+    db.query(RecordTag).filter(RecordTag.record_id == record_id).delete(synchronize_session=False)
+    if names:
+        db.bulk_insert_mappings(RecordTag, [
+            {"record_id": record_id, "tag_id": tag_id} for tag_id in _get_or_create_tag_ids(db, names)
+        ])
+    prune_tags(db, old_ids)
+
+
+def remove_record_tags(db: Session, record_id: str) -> None:
+    set_record_tags(db, record_id, [])
+
+
+def _records_with_tag(condition):
+    return Record.id.in_(select(RecordTag.record_id).join(Tag, Tag.id == RecordTag.tag_id).where(condition))
+
+
+def tag_filter(term: str):
+    """?tag= 的篩選條件：完全相符，結尾為 * 時為前綴比對；前綴為空時回傳 None"""
+    term = term.strip()
+    if term.endswith(PREFIX_WILDCARD):
+        prefix = term[:-len(PREFIX_WILDCARD)].strip()
+        if not prefix:
+            return None
+        return _records_with_tag(and_(Tag.name >= prefix, Tag.name < prefix + _PREFIX_UPPER))
+    if not term:
+        return None
+    return _records_with_tag(Tag.name == term)
+
+
+def tag_keyword_filter(pattern: str):
+    """關鍵字搜尋退回 LIKE 時比對標籤名稱，不會誤中其他標籤的 JSON 標點"""
+    return _records_with_tag(Tag.name.ilike(pattern))
+
+
+def tag_cloud(db: Session, user_ids, prefix: Optional[str] = None, limit: Optional[int] = None) -> list:
+    """標籤雲：讀取彙總表的各標籤紀錄數（viewer 合計所有 owner），依次數降冪"""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return []
+    count = func.sum(SummaryTag.count)
+    query = db.query(SummaryTag.tag, count).filter(SummaryTag.user_id.in_(user_ids), SummaryTag.count > 0)
+    if prefix:
+        query = query.filter(SummaryTag.tag >= prefix, SummaryTag.tag < prefix + _PREFIX_UPPER)
+    query = query.group_by(SummaryTag.tag).order_by(count.desc(), SummaryTag.tag.asc())
+    if limit:
+        query = query.limit(limit)
+    return [{"name": name, "count": n} for name, n in query.all()]
+
+
+def rebuild_tags(db: Session) -> int:
+    """清空並從 Record.tags JSON 欄位重建標籤關聯、刪除未使用的標籤，回傳處理的紀錄數"""
+    db.query(RecordTag).delete(synchronize_session=False)
+    count = 0
+    for record_id, tags_json in db.query(Record.id, Record.tags).yield_per(1000):
+        try:
+            names = normalize_tags(json.loads(tags_json) if tags_json else [])
+        except ValueError:
+            continue
+        if names:
+            db.bulk_insert_mappings(RecordTag, [
+                {"record_id": record_id, "tag_id": tag_id} for tag_id in _get_or_create_tag_ids(db, names)
+            ])
+        count += 1
+    prune_tags(db)
+    return count
+
+
+def migrate_tags(engine) -> bool:
+    """舊資料遷移：record_tags 為空但已有帶標籤的紀錄時，從 JSON 欄位回填；回傳是否執行"""
+    with Session(bind=engine) as db:
+        if db.query(RecordTag.record_id).first() is not None:
+            return False
+        tagged = db.query(Record.id).filter(
+            Record.tags.isnot(None), Record.tags.notin_(["", "[]"])
+        ).first()
+        if tagged is None:
+            return False
+        rebuild_tags(db)
+        db.commit()
+        return True
@@ -0,0 +1,34 @@
+"""
+測試共用設定
+資料庫位置必須在匯入 database 之前決定，因此在此以暫存的 SQLite 檔案覆寫 DATABASE_URL
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='mysite-test-'), 'test.db')}"
+os.environ.setdefault("OWNER_EMAIL", "owner@example.com")
+os.environ["OPENAI_API_KEY"] = ""
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def db():
+    from database import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
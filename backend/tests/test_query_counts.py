@@ -0,0 +1,77 @@
+"""
+留言端點的 SQL 陳述式數量
+每則留言都要附上作者 email，一筆紀錄的留言來自多位不同作者時，
+若 Comment.user 改回 lazy load 會變成每位作者一次查詢（N+1），此處以固定數量把關
+"""
+import pytest
+
+from auth import create_access_token, hash_password
+from database import engine
+from db_utils import StatementCounter
+from models import Comment, Record, User
+
+AUTHOR_COUNT = 20
+
+# 熱快取下的固定查詢數：etag 的 owner 版本、留言（JOIN users）
+COMMENTS_STATEMENTS = 2
+# 批次端點不經過 etag，只有一次留言查詢（紀錄條件為子查詢）
+COMMENTS_BATCH_STATEMENTS = 1
+
+
+@pytest.fixture(scope="module")
+def seeded(client):
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        password_hash = hash_password("secret1")
+        owner = db.query(User).filter(User.email == "owner@example.com").first()
+        if owner is None:
+            owner = User(email="owner@example.com", password_hash=password_hash, role="owner")
+            db.add(owner)
+            db.flush()
+        authors = [
+            User(email=f"author{i}@example.com", password_hash=password_hash, role="viewer")
+            for i in range(AUTHOR_COUNT)
+        ]
+        db.add_all(authors)
+        record = Record(user_id=owner.id, date="2026-01-05", title="週會", content="討論進度")
+        db.add(record)
+        db.flush()
+        db.add_all([
+            Comment(record_id=record.id, user_id=author.id, content=f"留言 {i}")
+            for i, author in enumerate(authors)
+        ])
+        db.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(owner.id)}"}
+        return record.id, headers
+    finally:
+        db.close()
+
+
+def count_statements(request):
+    request()  # 暖機：填入用戶與 owner 快取，只計算穩定狀態下的查詢
+    with StatementCounter(engine) as statements:
+        response = request()
+    assert response.status_code == 200, response.text
+    return response, statements.count
+
+
+def test_comments_of_many_authors_use_fixed_statements(client, seeded):
+    record_id, headers = seeded
+    response, count = count_statements(
+        lambda: client.get(f"/api/records/{record_id}/comments", headers=headers)
+    )
+    comments = response.json()["comments"]
+    assert len({c["user_email"] for c in comments}) == AUTHOR_COUNT
+    assert count == COMMENTS_STATEMENTS
+
+
+def test_comments_batch_of_many_authors_use_fixed_statements(client, seeded):
+    record_id, headers = seeded
+    response, count = count_statements(
+        lambda: client.post("/api/comments/batch", json={"record_ids": [record_id]}, headers=headers)
+    )
+    comments = response.json()["comments"][record_id]
+    assert len({c["user_email"] for c in comments}) == AUTHOR_COUNT
+    assert count == COMMENTS_BATCH_STATEMENTS
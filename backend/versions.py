@@ -0,0 +1,78 @@
+"""
+各 owner 的資料版本
+紀錄、留言、個人資料寫入時在同一個交易內遞增 data_versions，版本單調遞增且跨行程一致；
+讀取端（ETag、/api/sync/version、伺服器端快取）以版本判斷內容是否變動，不必重跑查詢
+"""
+import base64
+import json
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from models import DataVersion, Record, Tombstone
+
+
+def bump_version(db: Session, owner_id: Optional[str]) -> Optional[int]:
+    """遞增 owner 的資料版本並回傳新版本；須在寫入的交易內、commit 之前呼叫"""
+    if not owner_id:
+        return None
+    updated = db.query(DataVersion).filter(DataVersion.owner_id == owner_id).update(
+        {DataVersion.version: DataVersion.version + 1}, synchronize_session=False
+    )
+    if not updated:
+        db.add(DataVersion(owner_id=owner_id, version=1))
+        db.flush()
+    return db.query(DataVersion.version).filter(DataVersion.owner_id == owner_id).scalar()
+
+
+def get_versions(db: Session, owner_ids) -> dict:
+    """一次主鍵查詢取得多位 owner 的版本，尚未寫入過的 owner 為 0"""
+    owner_ids = list(owner_ids)
+    if not owner_ids:
+        return {}
+    rows = dict(db.query(DataVersion.owner_id, DataVersion.version).filter(
+        DataVersion.owner_id.in_(owner_ids)
+    ).all())
+    return {owner_id: rows.get(owner_id, 0) for owner_id in owner_ids}
+
+
+def record_owner_id(db: Session, record_id: str) -> Optional[str]:
+    """留言寫入時找出紀錄所屬的 owner"""
+    row = db.query(Record.user_id).filter(Record.id == record_id).first()
+    return row[0] if row else None
+
+
+def add_tombstone(db: Session, owner_id: Optional[str], entity: str, entity_id: str) -> Optional[int]:
+    """刪除紀錄／留言時呼叫：遞增版本並留下墓碑，回傳新版本"""
+    return add_tombstones(db, owner_id, entity, [entity_id])
+
+
+def add_tombstones(db: Session, owner_id: Optional[str], entity: str, entity_ids: list) -> Optional[int]:
+    """一次刪除多筆（如紀錄連帶的留言）時只遞增一次版本，所有墓碑共用新版本"""
+    if not entity_ids:
+        return None
+    version = bump_version(db, owner_id)
+    if version is not None:
+        db.bulk_insert_mappings(Tombstone, [
+            {"owner_id": owner_id, "entity": entity, "entity_id": entity_id, "version": version}
+            for entity_id in entity_ids
+        ])
+    return version
+
+
+def encode_sync_token(versions: dict) -> str:
+    """將各 owner 的版本編成不透明的同步游標"""
+    raw = json.dumps(versions, separators=(",", ":"), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_sync_token(token: str) -> dict:
+    """解析同步游標；格式錯誤時拋出 ValueError"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("invalid sync token")
+    if not isinstance(data, dict) or not all(isinstance(v, int) for v in data.values()):
+        raise ValueError("invalid sync token")
+    return data
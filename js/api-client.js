@@ -102,19 +102,23 @@ const ApiClient = {
 
     // ===== 紀錄 CRUD =====
 
-    async getAllRecords(sort = 'date-desc', search = '') {
+    async getRecordsPage(sort = 'date-desc', search = '', limit = 50, cursor = null, tags = []) {
         const params = new URLSearchParams();
         if (sort) params.set('sort', sort);
         if (search) params.set('search', search);
+        tags.forEach(tag => params.append('tag', tag));
+        params.set('limit', limit);
+        if (cursor) params.set('cursor', cursor);
         return this.request(`/api/records?${params}`);
     },
 
-    async getRecordById(id) {
-        return this.request(`/api/records/${id}`);
+    async getRecordStats() {
+        return this.request('/api/records/stats');
     },
 
-    async getAdjacentRecords(id) {
-        return this.request(`/api/records/${id}/adjacent`);
+    async getRecordById(id, { includeAdjacent = false } = {}) {
+        const query = includeAdjacent ? '?include_adjacent=true' : '';
+        return this.request(`/api/records/${id}${query}`);
     },
 
     async addRecord(data) {
@@ -173,6 +177,13 @@ const ApiClient = {
         return this.request(`/api/comments/${commentId}`, { method: 'DELETE' });
     },
 
+    // ===== 報表 =====
+
+    async getReportRange(from, to) {
+        const params = new URLSearchParams({ from, to });
+        return this.request(`/api/reports/range?${params}`);
+    },
+
     // ===== 個人資料 =====
 
     async getProfile() {
@@ -195,4 +206,60 @@ const ApiClient = {
         });
         return data ? data.summary : '';
     },
+
+    // 以 SSE 串流摘要：onDelta(text) 逐段回呼，回傳完整摘要；signal 可用於中途取消（後端會一併取消上游請求）
+    async summarizeStream(content, onDelta, { signal } = {}, retried = false) {
+        const response = await fetch(`${this.BASE_URL}/api/llm/summarize/stream`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'ngrok-skip-browser-warning': '1',
+                ...(this.accessToken ? { 'Authorization': `Bearer ${this.accessToken}` } : {}),
+            },
+            body: JSON.stringify({ content }),
+            credentials: 'include',
+            signal,
+        });
+
+        if (response.status === 401 && !retried && await this.refreshAccessToken()) {
+            return this.summarizeStream(content, onDelta, { signal }, true);
+        }
+        if (!response.ok) {
+            const err = await response.json().catch(() => ({ detail: '請求失敗' }));
+            throw new Error(err.detail || `HTTP ${response.status}`);
+        }
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        let summary = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                const event = (block.match(/^event: (.*)$/m) || [])[1];
+                const data = JSON.parse((block.match(/^data: (.*)$/m) || [])[1] || '{}');
+                if (event === 'delta') {
+                    summary += data.text;
+                    if (onDelta) onDelta(data.text);
+                } else if (event === 'done') {
+                    summary = data.summary;
+                } else if (event === 'error') {
+                    throw new Error(data.detail);
+                }
+            }
+        }
+        return summary;
+    },
+
+    async summarizeBatch(contents) {
+        const data = await this.request('/api/llm/summarize/batch', {
+            method: 'POST',
+            body: JSON.stringify({ contents }),
+        });
+        return data ? data.results : [];
+    },
 };
@@ -4,30 +4,13 @@
 
 let allRecords = [];
 let currentSort = 'date-desc';
+let currentSearch = '';
+let nextCursor = null;
+let dashboardStats = null;
+const RECORDS_PAGE_SIZE = 50;
 const INTERNSHIP_TARGET_HOURS = 324;
 
-function parseHourMinute(value, fallback) {
-  const raw = (value || fallback || '').trim();
-  const match = raw.match(/^(\d{1,2}):(\d{2})$/);
-  if (!match) return null;
-  const hours = Number(match[1]);
-  const minutes = Number(match[2]);
-  if (Number.isNaN(hours) || Number.isNaN(minutes)) return null;
-  return hours * 60 + minutes;
-}
-
-function calculateRecordHours(record) {
-  const startMinutes = parseHourMinute(record.startTime, '09:00');
-  const endMinutes = parseHourMinute(record.endTime, '18:00');
-  if (startMinutes == null || endMinutes == null || endMinutes <= startMinutes) {
-    return 0;
-  }
-  const duration = (endMinutes - startMinutes) / 60;
-  return duration > 4 ? duration - 1 : duration;
-}
-
-function updateHoursProgress(records) {
-  const totalHours = records.reduce((sum, record) => sum + calculateRecordHours(record), 0);
+function updateHoursProgress(totalHours) {
   const roundedHours = Math.round(totalHours * 10) / 10;
   const progress = INTERNSHIP_TARGET_HOURS > 0
     ? Math.min((roundedHours / INTERNSHIP_TARGET_HOURS) * 100, 100)
@@ -145,11 +128,34 @@ async function saveProfile(event) {
 
 async function loadRecords(search = '') {
   try {
-    const { records } = await ApiClient.getAllRecords(currentSort, search);
-    allRecords = records;
+    const [page, { stats }] = await Promise.all([
+      ApiClient.getRecordsPage(currentSort, search, RECORDS_PAGE_SIZE),
+      ApiClient.getRecordStats(),
+    ]);
+    setRecordsPage(page, search);
+    dashboardStats = stats;
+    updateStatistics(stats);
+    updateHoursProgress(stats.total_hours);
+  } catch (e) {
+    Utils.showNotification('載入紀錄失敗', 'error');
+  }
+}
+
+// 第一頁取代目前列表，之後以 next_cursor 逐頁往下接
+function setRecordsPage(page, search) {
+  currentSearch = search;
+  allRecords = page.records;
+  nextCursor = page.next_cursor;
+  renderRecords(allRecords);
+}
+
+async function loadMoreRecords() {
+  if (!nextCursor) return;
+  try {
+    const page = await ApiClient.getRecordsPage(currentSort, currentSearch, RECORDS_PAGE_SIZE, nextCursor);
+    allRecords = allRecords.concat(page.records);
+    nextCursor = page.next_cursor;
     renderRecords(allRecords);
-    updateStatistics(allRecords);
-    updateHoursProgress(allRecords);
   } catch (e) {
     Utils.showNotification('載入紀錄失敗', 'error');
   }
@@ -170,10 +176,17 @@ function renderRecords(records) {
     return;
   }
 
+  const loadMoreHTML = nextCursor
+    ? `<div style="text-align: center; margin-top: var(--spacing-md);">
+        <button type="button" class="btn btn-secondary" onclick="loadMoreRecords()">載入更多</button>
+      </div>`
+    : '';
+
   container.innerHTML = `
     <div class="timeline">
       ${records.map((record, index) => createRecordCard(record, index)).join('')}
     </div>
+    ${loadMoreHTML}
   `;
 }
 
@@ -225,9 +238,9 @@ function handleSearch(event) {
   searchTimeout = setTimeout(async () => {
     if (query.trim()) {
       try {
-        const { records } = await ApiClient.getAllRecords(currentSort, query);
-        renderRecords(records);
-        showSearchResults(records, query);
+        const page = await ApiClient.getRecordsPage(currentSort, query, RECORDS_PAGE_SIZE);
+        setRecordsPage(page, query);
+        showSearchResults(page.records, query);
       } catch (e) {
         console.error('搜尋失敗', e);
       }
@@ -265,24 +278,10 @@ function hideSearchResults() {
 // 統計數據
 // ===================================
 
-function updateStatistics(records) {
-  document.getElementById('totalRecords').textContent = records.length;
-
-  const allTags = new Set();
-  records.forEach(record => {
-    if (record.tags) record.tags.forEach(tag => allTags.add(tag));
-  });
-  document.getElementById('totalTags').textContent = allTags.size;
-
-  if (records.length > 0) {
-    const dates = records.map(r => new Date(r.date));
-    const minDate = new Date(Math.min(...dates));
-    const maxDate = new Date(Math.max(...dates));
-    const dayCount = Math.floor((maxDate - minDate) / (1000 * 60 * 60 * 24)) + 1;
-    document.getElementById('dayCount').textContent = dayCount;
-  } else {
-    document.getElementById('dayCount').textContent = 0;
-  }
+function updateStatistics(stats) {
+  document.getElementById('totalRecords').textContent = stats.total_records;
+  document.getElementById('totalTags').textContent = stats.total_tags;
+  document.getElementById('dayCount').textContent = stats.day_count;
 }
 
 // ===================================
@@ -337,11 +336,10 @@ async function startPDFExport() {
   const btn = document.getElementById('exportPdfBtn');
   const pdfExporter = new PDFExporter();
 
-  let targetDate = new Date();
-  if (allRecords.length > 0) {
-    const sorted = [...allRecords].sort((a, b) => new Date(b.date) - new Date(a.date));
-    targetDate = new Date(sorted[0].date);
-  }
+  // 預設為最新一筆紀錄的日期，取自彙總統計，不需要載入全部紀錄
+  const targetDate = dashboardStats && dashboardStats.last_date
+    ? new Date(dashboardStats.last_date)
+    : new Date();
 
   const originalText = btn.innerHTML;
   btn.innerHTML = '⏳ 處理中...';
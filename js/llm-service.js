@@ -6,4 +6,14 @@ class LLMService {
     async summarize(text) {
         return ApiClient.summarize(text);
     }
+
+    // 串流摘要：逐段回呼 onDelta，適合需要即時顯示的畫面
+    async summarizeStream(text, onDelta, options) {
+        return ApiClient.summarizeStream(text, onDelta, options);
+    }
+
+    // 一次送出多筆內容，由後端去重、快取並限制上游併發；回傳與 texts 順序相同的結果
+    async summarizeBatch(texts) {
+        return ApiClient.summarizeBatch(texts);
+    }
 }
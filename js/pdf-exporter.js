@@ -18,29 +18,35 @@ class PDFExporter {
                 return;
             }
 
-            // 2. Batch Summarize with Parallel Requests
-            const recordsWithSummary = await Promise.all(records.map(async (rec) => {
-                let summary = "";
+            // 2. 已有背景預先摘要的紀錄直接使用，其餘以一次 Batch Summarize 請求補齊
+            const pending = records.filter(rec => !rec.summary);
+            const resultById = {};
+            if (pending.length > 0) {
                 try {
-                    const result = await this.llmService.summarize(rec.content);
-                    summary = (result && result.trim().length > 0)
-                        ? result
-                        : "（本週無具體開發實作事項）";
+                    const results = await this.llmService.summarizeBatch(pending.map(rec => rec.content));
+                    pending.forEach((rec, i) => { resultById[rec.id] = results[i]; });
                 } catch (e) {
-                    console.error(`摘要失敗 (ID: ${rec.id}):`, e);
-                    // 摘要失敗時，將原始內容轉成條列式
-                    summary = rec.content
-                        .split('\n')
-                        .map(line => line.trim())
-                        .filter(line => line.length > 0)
-                        .map(line => `• ${line}`)
-                        .join('\n');
+                    console.error('批次摘要失敗:', e);
+                }
+            }
+
+            const recordsWithSummary = records.map(rec => {
+                const result = rec.summary ? { summary: rec.summary } : resultById[rec.id];
+                let summary;
+                if (!result) {
+                    // 整批請求失敗時，將原始內容轉成條列式
+                    summary = this.fallbackSummary(rec.content);
+                } else {
+                    if (result.error) console.error(`摘要失敗 (ID: ${rec.id}):`, result.error);
+                    summary = (result.summary && result.summary.trim().length > 0)
+                        ? result.summary
+                        : "（本週無具體開發實作事項）";
                 }
                 return {
                     ...rec,
                     summary: summary.replace(/\n\s*\n/g, '\n').trim()
                 };
-            }));
+            });
 
             // Sort by date ascending for the table
             recordsWithSummary.sort((a, b) => new Date(a.date) - new Date(b.date));
@@ -54,6 +60,15 @@ class PDFExporter {
         }
     }
 
+    fallbackSummary(content) {
+        return content
+            .split('\n')
+            .map(line => line.trim())
+            .filter(line => line.length > 0)
+            .map(line => `• ${line}`)
+            .join('\n');
+    }
+
     showDateRangePicker(defaultDate) {
         return new Promise((resolve) => {
             // 預設為所在週的週一到週日
@@ -128,23 +143,19 @@ class PDFExporter {
     }
 
     async getRecordsForRange(startDate, endDate) {
-        const data = await ApiClient.getAllRecords();
-        const allRecords = (data.records || []).filter(r => {
-            const rd = new Date(r.date);
-            return rd >= startDate && rd <= endDate;
-        });
-
-        // 為每筆紀錄附加留言
-        await Promise.all(allRecords.map(async (r) => {
-            try {
-                const { comments } = await ApiClient.getComments(r.id);
-                r.feedback = comments.map(c => c.content).join('\n');
-            } catch (e) {
-                r.feedback = '';
-            }
+        // 由後端以日期區間查詢，一併帶回留言與工時
+        const data = await ApiClient.getReportRange(this.toDateParam(startDate), this.toDateParam(endDate));
+        return (data.records || []).map(r => ({
+            ...r,
+            feedback: (r.comments || []).map(c => c.content).join('\n'),
         }));
+    }
 
-        return allRecords;
+    toDateParam(date) {
+        const y = date.getFullYear();
+        const m = String(date.getMonth() + 1).padStart(2, '0');
+        const d = String(date.getDate()).padStart(2, '0');
+        return `${y}-${m}-${d}`;
     }
 
     summaryToHtml(text) {
@@ -36,10 +36,10 @@ document.addEventListener('DOMContentLoaded', async () => {
 
 async function loadRecord() {
     try {
-        const { record } = await ApiClient.getRecordById(currentRecordId);
+        const { record, prev, next } = await ApiClient.getRecordById(currentRecordId, { includeAdjacent: true });
         currentRecord = record;
         renderRecord();
-        await loadAdjacentRecords();
+        renderAdjacentRecords(prev, next);
     } catch (e) {
         showError('紀錄不存在或無權限存取');
     }
@@ -209,25 +209,45 @@ async function addComment() {
     }
 }
 
-async function loadAdjacentRecords() {
-    try {
-        const { prev, next } = await ApiClient.getAdjacentRecords(currentRecordId);
+function renderAdjacentRecords(prev, next) {
+    if (prev) {
+        const prevLink = document.getElementById('prevRecord');
+        prevLink.href = `record-detail.html?id=${prev.id}`;
+        prevLink.querySelector('.nav-title').textContent = prev.title;
+        prevLink.style.display = 'block';
+    }
 
-        if (prev) {
-            const prevLink = document.getElementById('prevRecord');
-            prevLink.href = `record-detail.html?id=${prev.id}`;
-            prevLink.querySelector('.nav-title').textContent = prev.title;
-            prevLink.style.display = 'block';
-        }
+    if (next) {
+        const nextLink = document.getElementById('nextRecord');
+        nextLink.href = `record-detail.html?id=${next.id}`;
+        nextLink.querySelector('.nav-title').textContent = next.title;
+        nextLink.style.display = 'block';
+    }
+}
 
-        if (next) {
-            const nextLink = document.getElementById('nextRecord');
-            nextLink.href = `record-detail.html?id=${next.id}`;
-            nextLink.querySelector('.nav-title').textContent = next.title;
-            nextLink.style.display = 'block';
-        }
+// ===================================
+// AI 摘要
+// ===================================
+
+async function streamSummary() {
+    const btn = document.getElementById('summarizeBtn');
+    const box = document.getElementById('summaryBox');
+    btn.disabled = true;
+    btn.textContent = '⏳ 摘要中...';
+    box.textContent = '';
+    box.style.display = 'block';
+    try {
+        // 後端以 SSE 逐段送出，收到即顯示，不必等整份摘要完成
+        const summary = await new LLMService().summarizeStream(currentRecord.content, text => {
+            box.textContent += text;
+        });
+        box.textContent = summary;
     } catch (e) {
-        console.error('載入相鄰紀錄失敗', e);
+        box.style.display = 'none';
+        Utils.showNotification('❌ 摘要失敗：' + e.message, 'error');
+    } finally {
+        btn.disabled = false;
+        btn.textContent = '✨ AI 摘要';
     }
 }
 
@@ -273,6 +293,7 @@ function showError(message) {
 // ===================================
 
 function setupEventListeners() {
+    document.getElementById('summarizeBtn').addEventListener('click', streamSummary);
     document.getElementById('editBtn').addEventListener('click', editRecord);
     document.getElementById('deleteBtn').addEventListener('click', deleteRecord);
     document.getElementById('addCommentBtn').addEventListener('click', addComment);